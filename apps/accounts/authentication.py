@@ -0,0 +1,31 @@
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from apps.common.caches import LRUCache
+
+# cached users are shared between requests and must not be modified,
+# saving or deleting a user evicts it (see signals)
+user_cache = LRUCache(
+    settings.ORGANIZER_AUTH_CACHE_SIZE, settings.ORGANIZER_AUTH_CACHE_TIMEOUT_IN_SECS
+)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication resolving the user id claim of the token through a
+    short lived per process cache, so an organizer's requests do not load
+    the user from the database every time. Inactive and missing users are
+    never cached and keep failing authentication.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+        user = user_cache.get(user_id)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+        return user
@@ -0,0 +1,12 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.settings import api_settings
+from .authentication import user_cache
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def handle_user_changed(sender, instance, **kwargs):
+    # deactivated or changed users must not be served from the cache
+    user_cache.invalidate(getattr(instance, api_settings.USER_ID_FIELD))
@@ -0,0 +1,46 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread safe LRU kept in the memory of one process, each entry kept for
+    at most timeout seconds. Keys are compared as strings. Processes do not
+    share it, so the owner of the cache evicts changed entries in its own
+    process and the timeout bounds how long other processes keep them.
+    """
+
+    def __init__(self, size, timeout):
+        self.size, self.timeout = size, timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        key = str(key)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        key = str(key)
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.timeout)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self.lock:
+            self.entries.pop(str(key), None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
@@ -26,6 +26,9 @@ def custom_exception_handler(exc, context):
 
     response = exception_handler(exc, context)
     default_data = response.data
+    if isinstance(default_data, list):
+        # many=True serializers report one error entry per item
+        default_data = {"error": default_data}
     message = default_data.get("detail")
     error = (
         default_data.get("error") or default_data
@@ -0,0 +1,82 @@
+import io
+import time
+
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand, CommandError
+from apps.common.utils import send_html_email
+from apps.election.models import Election
+from apps.voting.credentials import CREDENTIALS_SUBJECT, CREDENTIALS_TEMPLATE
+from apps.voting.models import OutboxEmail, Voter
+from apps.voting.outbox import render_context, send_emails
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare credential mails per second sent one connection per mail "
+        "against outbox batches sent over one connection"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=1000)
+        parser.add_argument(
+            "--chunk-size", type=int, default=20, help="mails per outbox batch"
+        )
+        parser.add_argument(
+            "--backend",
+            default="django.core.mail.backends.console.EmailBackend",
+            help="email backend to send through, the console one by default",
+        )
+
+    def handle(self, *args, **options):
+        count, size = options["messages"], options["chunk_size"]
+        if count < 1 or size < 1:
+            raise CommandError("--messages and --chunk-size must be at least 1")
+        election = Election(title="Benchmark election")
+        # never saved: the outbox updates the status of no row
+        emails = [
+            OutboxEmail(
+                voter=Voter(
+                    election=election,
+                    email=f"voter{i}@example.com",
+                    pass_name=f"voter{i}",
+                ),
+                template=CREDENTIALS_TEMPLATE,
+                subject=CREDENTIALS_SUBJECT,
+                recipient=f"voter{i}@example.com",
+                context={"pass_key": f"pass-key-{i}"},
+            )
+            for i in range(count)
+        ]
+
+        def connection():
+            # the console backend writes to this stream instead of stdout
+            return get_connection(options["backend"], stream=io.StringIO())
+
+        start = time.perf_counter()
+        for email in emails:
+            send_html_email(
+                email.template,
+                render_context(email),
+                email.recipient,
+                email.subject,
+                connection(),
+            )
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        failed = 0
+        for index in range(0, count, size):
+            batch_connection = connection()
+            try:
+                results, _ = send_emails(batch_connection, emails[index : index + size])
+            finally:
+                batch_connection.close()
+            failed += results["failed"] + results["retried"]
+        batched = time.perf_counter() - start
+
+        self.stdout.write(f"one connection per mail: {count / single:.0f} mails/s")
+        self.stdout.write(
+            f"outbox batches of {size} per connection: {count / batched:.0f} mails/s, "
+            f"{failed} failed"
+        )
+        self.stdout.write(self.style.SUCCESS(f"{single / batched:.1f}x faster"))
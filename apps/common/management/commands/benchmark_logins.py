@@ -0,0 +1,78 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.management.base import BaseCommand, CommandError
+from apps.voting.login import VerificationPool, VerificationPoolFull
+from apps.voting.utils import generate_password
+
+
+class Command(BaseCommand):
+    help = (
+        "Report pass key verifications per second per core of concurrent "
+        "voter logins, on the request threads and on the verification pool"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--logins", type=int, default=200)
+        parser.add_argument(
+            "--clients", type=int, default=32, help="concurrent request threads"
+        )
+        parser.add_argument(
+            "--workers", type=int, default=settings.LOGIN_VERIFICATION_WORKERS
+        )
+        parser.add_argument(
+            "--max-queue", type=int, default=settings.LOGIN_VERIFICATION_MAX_QUEUE
+        )
+
+    def handle(self, *args, **options):
+        count, clients = options["logins"], options["clients"]
+        if min(count, clients, options["workers"]) < 1:
+            raise CommandError("--logins, --clients and --workers must be at least 1")
+        cores = os.cpu_count() or 1
+        raw_password = generate_password()
+        encoded = make_password(raw_password)
+
+        def report(name, elapsed, verified, rejected=0):
+            if verified + rejected != count:
+                raise CommandError(f"{name}: a valid pass key did not verify")
+            rate = verified / elapsed
+            self.stdout.write(
+                f"{name}: {rate:.1f} logins/s, {rate / cores:.1f} logins/s/core"
+            )
+            return rate
+
+        with ThreadPoolExecutor(max_workers=clients) as requests:
+            start = time.perf_counter()
+            verified = sum(
+                requests.map(
+                    lambda _: check_password(raw_password, encoded), range(count)
+                )
+            )
+            inline = report("request threads", time.perf_counter() - start, verified)
+
+            pool = VerificationPool(options["workers"], options["max_queue"])
+
+            def login(_):
+                try:
+                    return pool.check_password(raw_password, encoded)
+                except VerificationPoolFull:
+                    return False
+
+            start = time.perf_counter()
+            verified = sum(requests.map(login, range(count)))
+            elapsed = time.perf_counter() - start
+            metrics = pool.metrics()
+            pooled = report("verification pool", elapsed, verified, metrics["rejected"])
+
+        self.stdout.write(
+            f"{cores} cores, {options['workers']} workers: "
+            f"max queue depth {metrics['max_queue_depth']}, "
+            f"mean wait {metrics['mean_wait_ms']} ms, "
+            f"max wait {metrics['max_wait_secs'] * 1000:.1f} ms, "
+            f"mean hash {metrics['mean_hash_ms']} ms, "
+            f"{metrics['rejected']} turned away"
+        )
+        self.stdout.write(self.style.SUCCESS(f"{pooled / inline:.2f}x the throughput"))
@@ -0,0 +1,95 @@
+import json
+import time
+import uuid
+from collections import OrderedDict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from apps.common.renderers import FastJSONRenderer, envelope, orjson
+
+
+def sample_election(questions, options):
+    """an election shaped like ElectionFullDetailSerializer output"""
+    now = timezone.now().isoformat()
+
+    def item(title, **extra):
+        return OrderedDict(
+            id=str(uuid.uuid4()),
+            title=title,
+            short_description="short description " * 4,
+            description="a longer description of the ballot entry " * 10,
+            image=f"http://localhost:8000/media/elections/{uuid.uuid4()}.png",
+            created_at=now,
+            **extra,
+        )
+
+    return OrderedDict(
+        id=str(uuid.uuid4()),
+        title="Benchmark election",
+        description="description " * 20,
+        start_date=now,
+        end_date=now,
+        timezone="Africa/Lagos",
+        created_by=uuid.uuid4(),
+        created_at=now,
+        last_updated=now,
+        status="LIVE",
+        live_code="live-code",
+        preview_code="preview-code",
+        ballot_questions=[
+            item(
+                f"Question {q}",
+                validation_choice_max=1,
+                validation_choice_min=1,
+                options=[item(f"Option {q}-{o}") for o in range(options)],
+            )
+            for q in range(questions)
+        ],
+    )
+
+
+class Command(BaseCommand):
+    help = "Compare bytes per second of the JSON renderers on election payloads"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--elections", type=int, default=20)
+        parser.add_argument("--questions", type=int, default=20)
+        parser.add_argument("--options", type=int, default=10)
+        parser.add_argument("--iterations", type=int, default=50)
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1:
+            raise CommandError("--iterations must be at least 1")
+        data = envelope(
+            [
+                sample_election(options["questions"], options["options"])
+                for _ in range(options["elections"])
+            ],
+            "All Elections created by the authenticated user fetched successfully",
+        )
+        baseline = JSONRenderer().render(data)
+        if json.loads(FastJSONRenderer().render(data)) != json.loads(baseline):
+            raise CommandError("FastJSONRenderer output differs from JSONRenderer")
+        if orjson is None:
+            self.stderr.write("orjson is not installed, FastJSONRenderer falls back")
+
+        rates = {}
+        for renderer in (JSONRenderer(), FastJSONRenderer()):
+            start = time.perf_counter()
+            for _ in range(options["iterations"]):
+                size = len(renderer.render(data))
+            elapsed = time.perf_counter() - start
+            name = type(renderer).__name__
+            rates[name] = size * options["iterations"] / elapsed
+            self.stdout.write(
+                f"{name}: {size} bytes, "
+                f"{elapsed / options['iterations'] * 1000:.2f} ms/render, "
+                f"{rates[name] / 1024 / 1024:.1f} MiB/s"
+            )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"FastJSONRenderer is {rates['FastJSONRenderer'] / rates['JSONRenderer']:.1f}x "
+                "the throughput of JSONRenderer"
+            )
+        )
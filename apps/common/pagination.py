@@ -0,0 +1,44 @@
+from rest_framework.pagination import CursorPagination
+from rest_framework.response import Response
+
+
+class EnvelopeCursorPagination(CursorPagination):
+    """
+    Keyset pagination over an indexed ordering with opaque cursors, so
+    deep pages cost the same as the first one. Views merge the paginated
+    data into their {"status", "message", "data"} envelope.
+    """
+
+    # the cursor only records created_at and steps over rows sharing it with
+    # an offset, id keeps those rows in the same order from page to page
+    ordering = ("created_at", "id")
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "data": data,
+                "pagination": {
+                    "next": self.get_next_link(),
+                    "previous": self.get_previous_link(),
+                },
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "data": schema,
+                "pagination": {
+                    "type": "object",
+                    "properties": {
+                        "next": {"type": "string", "nullable": True},
+                        "previous": {"type": "string", "nullable": True},
+                    },
+                },
+            },
+        }
+
@@ -1,10 +1,42 @@
 from rest_framework import permissions
 
+# the relation leading to the election of an object, and the owner lookup
+# from the related model
+OWNER_RELATIONS = [
+    ("ballot_question", "election__created_by_id"),
+    ("election", "created_by_id"),
+]
+
+
+def get_owner_id(obj):
+    """
+    id of the user who created obj, or the election it belongs to. Related
+    rows already loaded are used, otherwise only the id is queried.
+    """
+    if hasattr(obj, "created_by_id"):
+        return obj.created_by_id
+    for name, lookup in OWNER_RELATIONS:
+        if not hasattr(obj, f"{name}_id"):
+            continue
+        field = obj._meta.get_field(name)
+        if field.is_cached(obj):
+            return get_owner_id(getattr(obj, name))
+        return (
+            field.related_model.objects.filter(pk=getattr(obj, field.attname))
+            .values_list(lookup, flat=True)
+            .first()
+        )
+    return None
+
+
+def is_owner(request, obj):
+    return request.user.is_authenticated and get_owner_id(obj) == request.user.id
+
 
 class IsOwnerOrReadOnly(permissions.BasePermission):
     """
     Object-level permission to only allow creator of an object to edit it.
-    Assumes the model instance has the attributes checked below.
+    The creator is found by get_owner_id.
     """
 
     def has_object_permission(self, request, view, obj):
@@ -12,25 +44,14 @@ class IsOwnerOrReadOnly(permissions.BasePermission):
         # so we'll always allow GET, HEAD or OPTIONS requests.
         if request.method in permissions.SAFE_METHODS:
             return True
-
-        if getattr(obj, "created_by", None) is not None:
-            return obj.created_by == request.user
-        if getattr(obj, "ballot_question", None) is not None:
-            return obj.ballot_question.election.created_by == request.user
-        if getattr(obj, "election", None) is not None:
-            return obj.election.created_by == request.user
+        return is_owner(request, obj)
 
 
 class IsOwner(permissions.BasePermission):
     """
     Object-level permission to only allow creator of an object to access it.
-    Assumes the model instance has the attributes checked below.
+    The creator is found by get_owner_id.
     """
 
     def has_object_permission(self, request, view, obj):
-        if getattr(obj, "created_by", None) is not None:
-            return obj.created_by == request.user
-        if getattr(obj, "ballot_question", None) is not None:
-            return obj.ballot_question.election.created_by == request.user
-        if getattr(obj, "election", None) is not None:
-            return obj.election.created_by == request.user
+        return is_owner(request, obj)
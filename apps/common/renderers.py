@@ -0,0 +1,48 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib json encoder of DRF
+    orjson = None
+
+
+def envelope(data, message, status="success", **extra):
+    """the {"status", "message", "data"} body every view responds with"""
+    return {"status": status, "message": message, "data": data, **extra}
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoding with orjson when it is installed. orjson writes
+    the serializer output (dicts, lists, strings, numbers, UUIDs) straight
+    to bytes; anything else, datetimes included, goes through DRF's encoder
+    so the output matches JSONRenderer. Keys may be str subclasses, such as
+    ErrorDetail. Indented output for browsers, the stdlib fallback and data
+    orjson refuses use the DRF renderer.
+    """
+
+    encoder = JSONEncoder()
+    options = (
+        0
+        if orjson is None
+        else orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        renderer_context = renderer_context or {}
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            return orjson.dumps(
+                data, default=self.encoder.default, option=self.options
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+
+
+def render_json(data):
+    """encode data as the API does, for bodies rendered outside a view"""
+    return FastJSONRenderer().render(data)
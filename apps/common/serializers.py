@@ -0,0 +1,58 @@
+def parse_query_list(value):
+    return {item.strip() for item in (value or "").split(",") if item.strip()}
+
+
+class FieldSelectionMixin:
+    """
+    Trims a serializer to the fields asked for with ?fields= and the nested
+    relations asked for with ?expand= on GET requests.
+
+    Meta.expandable_fields maps every expansion name to the dotted path of
+    its serializer field, Meta.default_expand lists the expansions served
+    when neither parameter is given. Expanding a nested path expands its
+    parents too.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields, expanded = self.get_selection(self.context.get("request"))
+        for path in self.Meta.expandable_fields.values():
+            if path not in expanded:
+                self.pop_field(path)
+        if fields is not None:
+            keep = fields | {path.split(".")[0] for path in expanded}
+            for name in set(self.fields) - keep:
+                self.fields.pop(name)
+
+    @classmethod
+    def get_selection(cls, request):
+        """
+        (fields, expanded paths) of the request, fields is None when every
+        field is wanted
+        """
+        params = {}
+        if request is not None and request.method == "GET":
+            params = request.query_params
+        if "fields" not in params and "expand" not in params:
+            names = cls.Meta.default_expand
+            fields = None
+        else:
+            names = parse_query_list(params.get("expand"))
+            fields = parse_query_list(params.get("fields")) or None
+        expanded = set()
+        for name in names:
+            path = cls.Meta.expandable_fields.get(name)
+            while path:
+                expanded.add(path)
+                path = path.rpartition(".")[0]
+        return fields, expanded
+
+    def pop_field(self, path):
+        *parents, name = path.split(".")
+        fields = self.fields
+        for parent in parents:
+            field = fields.get(parent)
+            if field is None:
+                return
+            fields = getattr(field, "child", field).fields
+        fields.pop(name, None)
@@ -1,3 +1,34 @@
-from django.test import TestCase
+import json
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+from rest_framework.exceptions import ErrorDetail
+from .caches import LRUCache
+from .renderers import FastJSONRenderer
+
+
+class FastJSONRendererTest(SimpleTestCase):
+    def test_error_detail_keys(self):
+        data = {ErrorDetail("email", code="invalid"): [ErrorDetail("Enter one.")]}
+        self.assertEqual(
+            json.loads(FastJSONRenderer().render(data)), {"email": ["Enter one."]}
+        )
+
+
+class LRUCacheTest(SimpleTestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = LRUCache(size=2, timeout=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual((cache.get("a"), cache.get("b"), cache.get("c")), (1, None, 3))
+
+    def test_entries_expire(self):
+        cache = LRUCache(size=2, timeout=60)
+        with mock.patch("apps.common.caches.time.monotonic", return_value=0):
+            cache.set(1, "one")
+        with mock.patch("apps.common.caches.time.monotonic", return_value=59):
+            self.assertEqual(cache.get("1"), "one")
+        with mock.patch("apps.common.caches.time.monotonic", return_value=60):
+            self.assertIsNone(cache.get(1))
@@ -6,7 +6,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-def send_html_email(template_path, context, recipient, subject):
+def send_html_email(template_path, context, recipient, subject, connection=None):
     email_body = render_to_string(template_path, context)
     logger.info(f"sending html mail to {recipient} from {settings.DEFAULT_FROM_EMAIL}")
     return send_mail(
@@ -15,4 +15,6 @@ def send_html_email(template_path, context, recipient, subject):
         f'{settings.DEFAULT_FROM_EMAIL}',
         [recipient],
         html_message=email_body,
+        connection=connection,
     )
+
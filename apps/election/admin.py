@@ -1,11 +1,14 @@
 from django.contrib import admin
 from .models import (
     BallotQuestion,
+    BallotSnapshot,
     Election,
     ElectionSetting,
     ElectionSettingCategory,
     ElectionSettingParameter,
+    FrozenElectionResult,
     Option,
+    OptionTally,
 )
 
 
@@ -19,6 +22,11 @@ class OptionAdmin(admin.ModelAdmin):
     list_display = ["id", "title", "short_description", "created_at", "ballot_question"]
 
 
+@admin.register(OptionTally)
+class OptionTallyAdmin(admin.ModelAdmin):
+    list_display = ["id", "option", "slot", "count"]
+
+
 @admin.register(BallotQuestion)
 class BallotQuestionAdmin(admin.ModelAdmin):
     list_display = [
@@ -62,6 +70,17 @@ class ElectionAdmin(admin.ModelAdmin):
     inlines = [BallotQuestionInlineAdmin]
 
 
+@admin.register(FrozenElectionResult)
+class FrozenElectionResultAdmin(admin.ModelAdmin):
+    list_display = ["id", "election", "content_hash", "frozen_at"]
+
+
+@admin.register(BallotSnapshot)
+class BallotSnapshotAdmin(admin.ModelAdmin):
+    list_display = ["id", "election", "version", "content_hash", "created_at"]
+    exclude = ["body", "body_gzip", "body_brotli"]
+
+
 @admin.register(ElectionSettingCategory)
 class ElectionSettingCategoryAdmin(admin.ModelAdmin):
     list_display = ["id", "name"]
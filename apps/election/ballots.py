@@ -0,0 +1,203 @@
+import gzip
+import hashlib
+import json
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from apps.common.renderers import envelope, render_json
+from .models import BallotSnapshot, Election, StatusChoices
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always served
+    brotli = None
+
+BALLOT_PAYLOAD_TIMEOUT_IN_SECS = 24 * 60 * 60
+BALLOT_BUILD_WAIT_IN_SECS = 2
+
+
+def code_key(code):
+    return f"election-code:{code}"
+
+
+def payload_key(code, stamp):
+    return f"election-ballot:{code}:{stamp}"
+
+
+def build_lock_key(code, stamp):
+    return f"election-ballot-lock:{code}:{stamp}"
+
+
+def get_ballot_payload(code, build):
+    """
+    Return the rendered voter-facing ballot of the election with this code
+    as {"etag", "body"} plus any precompressed "gzip"/"br" bodies, or None
+    when no election has the code.
+
+    Payloads are cached per code and Election.last_updated. A cache hit
+    costs two cache reads and neither ORM work nor JSON encoding. On a
+    miss one worker calls build(election) while concurrent misses wait for
+    its result.
+    """
+    stamp = cache.get(code_key(code))
+    if stamp is not None:
+        payload = cache.get(payload_key(code, stamp))
+        if payload is not None:
+            return payload
+
+    last_updated = (
+        Election.objects.filter(Q(live_code=code) | Q(preview_code=code))
+        .values_list("last_updated", flat=True)
+        .first()
+    )
+    if last_updated is None:
+        return None
+    stamp = last_updated.timestamp()
+    cache.set(
+        code_key(code), stamp, timeout=settings.ELECTION_BALLOT_CACHE_TIMEOUT_IN_SECS
+    )
+    key = payload_key(code, stamp)
+    payload = cache.get(key)
+    if payload is not None:
+        return payload
+
+    lock_key = build_lock_key(code, stamp)
+    locked = cache.add(lock_key, 1, timeout=BALLOT_BUILD_WAIT_IN_SECS * 5)
+    if not locked:
+        # another worker is rendering it, wait for its result
+        deadline = time.monotonic() + BALLOT_BUILD_WAIT_IN_SECS
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            payload = cache.get(key)
+            if payload is not None:
+                return payload
+    try:
+        election = Election.objects.filter(
+            Q(live_code=code) | Q(preview_code=code)
+        ).first()
+        if election is None:
+            return None
+        payload = build(election)
+        cache.set(
+            payload_key(code, election.last_updated.timestamp()),
+            payload,
+            timeout=BALLOT_PAYLOAD_TIMEOUT_IN_SECS,
+        )
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return payload
+
+
+def ballot_changed(election_id):
+    """
+    Bump Election.last_updated after a change to its ballot and stop
+    serving the cached payloads of its codes. A launched election gets
+    a new snapshot version.
+    """
+    refresh_ballot_snapshot(election_id)
+    Election.objects.filter(id=election_id).update(last_updated=timezone.now())
+    codes = Election.objects.filter(id=election_id).values_list(
+        "live_code", "preview_code"
+    )
+    forget_ballot_codes(code for pair in codes for code in pair)
+
+
+def forget_ballot_codes(codes):
+    cache.delete_many([code_key(code) for code in codes if code])
+
+
+def ballot_document(election):
+    """
+    The voter-facing ballot of an election with its settings, as plain
+    JSON types. Expects elections fetched with
+    Election.objects.with_ballot().with_settings().
+    """
+    from .serializers import (
+        ElectionFullDetailSerializer,
+        ElectionSettingParameterSerializer,
+    )
+
+    document = dict(ElectionFullDetailSerializer(election).data)
+    document["settings"] = ElectionSettingParameterSerializer(
+        election.electionsetting.configurations, many=True
+    ).data
+    return json.loads(render_json(document))
+
+
+def document_hash(document):
+    # last_updated moves on every save, it's not part of the ballot
+    content = {key: value for key, value in document.items() if key != "last_updated"}
+    content = json.dumps(content, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def render_snapshot(document):
+    data = {key: value for key, value in document.items() if key != "settings"}
+    data["mode"] = "LIVE"
+    return render_json(
+        envelope(data, f"Election {document['title']} retrieved successfully")
+    )
+
+
+def compile_ballot_snapshot(election_id):
+    """
+    Compile the ballot of an election into a new BallotSnapshot version,
+    rendered and compressed once. Compiling an unchanged ballot returns
+    the latest version.
+    """
+    with transaction.atomic():
+        election = (
+            Election.objects.select_for_update()
+            .with_ballot()
+            .with_settings()
+            .get(id=election_id)
+        )
+        latest = election.ballot_snapshots.order_by("-version").first()
+        document = ballot_document(election)
+        content_hash = document_hash(document)
+        if latest is not None and latest.content_hash == content_hash:
+            return latest
+        body = render_snapshot(document)
+        snapshot = BallotSnapshot.objects.create(
+            election=election,
+            version=1 if latest is None else latest.version + 1,
+            document=document,
+            content_hash=content_hash,
+            body=body,
+            body_gzip=gzip.compress(body),
+            body_brotli=None if brotli is None else brotli.compress(body),
+        )
+    if latest is not None:
+        # payloads cached from the previous version are keyed by the old stamp
+        Election.objects.filter(id=election_id).update(last_updated=timezone.now())
+        forget_ballot_codes([election.live_code, election.preview_code])
+    return snapshot
+
+
+def refresh_ballot_snapshot(election_id):
+    """compile a new snapshot version when a launched election changed"""
+    if Election.objects.filter(id=election_id, status=StatusChoices.LIVE).exists():
+        return compile_ballot_snapshot(election_id)
+
+
+def get_ballot_snapshot(election_id, fields=None):
+    """the latest snapshot of the election, or None before launch"""
+    snapshots = BallotSnapshot.objects.filter(election_id=election_id)
+    if fields:
+        snapshots = snapshots.only(*fields)
+    return snapshots.order_by("-version").first()
+
+
+def snapshot_payload(snapshot):
+    payload = {
+        "etag": f'"{snapshot.content_hash}"',
+        "body": bytes(snapshot.body),
+        "gzip": bytes(snapshot.body_gzip),
+    }
+    if snapshot.body_brotli is not None:
+        payload["br"] = bytes(snapshot.body_brotli)
+    return payload
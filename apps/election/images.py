@@ -0,0 +1,108 @@
+"""
+Resized WebP and JPEG variants of ballot question and option images.
+
+Variants are generated by a Celery task after the upload is committed and
+stored next to the original. The model keeps them in image_variants as
+{"source": <image name>, "webp": {<width>: <name>}, "jpeg": {...}} so a
+changed image is detected by comparing "source".
+"""
+import io
+import logging
+import posixpath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+VARIANT_FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+
+
+def variants_outdated(instance):
+    return instance.image_variants.get("source") != (instance.image.name or None)
+
+
+def variant_name(source, width, extension):
+    stem = posixpath.splitext(posixpath.basename(source))[0]
+    return f"{posixpath.dirname(source)}/variants/{stem}-{width}w.{extension}"
+
+
+def encode_variant(image, extension):
+    """encode without the EXIF, ICC or XMP metadata of the upload"""
+    if extension == "jpeg" and image.mode != "RGB":
+        image = image.convert("RGB")
+    buffer = io.BytesIO()
+    image.save(
+        buffer,
+        VARIANT_FORMATS[extension],
+        quality=settings.IMAGE_VARIANT_QUALITY,
+        optimize=extension == "jpeg",
+    )
+    return buffer.getvalue()
+
+
+def generate_image_variants(image_file):
+    """
+    Save the resized variants of an uploaded image and return the
+    image_variants map. Widths wider than the original are skipped.
+    """
+    storage = image_file.storage
+    with image_file.open("rb") as source_file:
+        source = Image.open(source_file)
+        # apply the EXIF orientation before it is stripped
+        source = ImageOps.exif_transpose(source)
+        source.load()
+    if source.mode not in ("RGB", "RGBA"):
+        transparent = "A" in source.getbands() or "transparency" in source.info
+        source = source.convert("RGBA" if transparent else "RGB")
+
+    variants = {"source": image_file.name}
+    widths = [
+        width for width in settings.IMAGE_VARIANT_WIDTHS if width < source.width
+    ] or [source.width]
+    for width in widths:
+        height = max(1, round(source.height * width / source.width))
+        resized = source.resize((width, height), Image.LANCZOS)
+        for extension in VARIANT_FORMATS:
+            name = variant_name(image_file.name, width, extension)
+            if storage.exists(name):
+                storage.delete(name)
+            name = storage.save(name, ContentFile(encode_variant(resized, extension)))
+            variants.setdefault(extension, {})[str(width)] = name
+    return variants
+
+
+def variant_names(variants):
+    return [
+        name
+        for extension in VARIANT_FORMATS
+        for name in variants.get(extension, {}).values()
+    ]
+
+
+def delete_image_variants(storage, variants, keep=()):
+    for name in variant_names(variants):
+        if name not in keep:
+            storage.delete(name)
+
+
+def get_srcset(instance, request=None):
+    """
+    {"webp": "<url> 320w, ...", "jpeg": ...} of the image variants, empty
+    until they are generated
+    """
+    if not instance.image or variants_outdated(instance):
+        return {}
+    storage = instance.image.storage
+    srcset = {}
+    for extension in VARIANT_FORMATS:
+        candidates = []
+        for width, name in instance.image_variants.get(extension, {}).items():
+            url = storage.url(name)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            candidates.append(f"{url} {width}w")
+        if candidates:
+            srcset[extension] = ", ".join(candidates)
+    return srcset
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from apps.election.models import Election, StatusChoices
+from apps.election.results import freeze_election_results
+
+
+class Command(BaseCommand):
+    help = "Compute and store (again) the final results of ended elections"
+
+    def add_arguments(self, parser):
+        parser.add_argument("election_ids", nargs="*", help="elections to freeze")
+        parser.add_argument(
+            "--all-ended",
+            action="store_true",
+            help="refreeze every live election whose end_date has passed",
+        )
+
+    def handle(self, *args, **options):
+        if options["all_ended"]:
+            elections = Election.objects.filter(
+                status=StatusChoices.LIVE, end_date__lte=timezone.now()
+            )
+        elif options["election_ids"]:
+            elections = Election.objects.filter(id__in=options["election_ids"])
+        else:
+            raise CommandError("Pass election ids or --all-ended")
+        for election in elections:
+            if election.end_date > timezone.now():
+                self.stderr.write(f"Skipping {election.title}, it has not ended")
+                continue
+            frozen_result = freeze_election_results(election)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Froze results of {election.title} ({frozen_result.content_hash})"
+                )
+            )
@@ -0,0 +1,39 @@
+# Generated by Django 4.0 on 2026-10-18 17:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+def backfill_option_tallies(apps, schema_editor):
+    Option = apps.get_model("election", "Option")
+    OptionTally = apps.get_model("election", "OptionTally")
+    tallies = [
+        OptionTally(option_id=option.id, slot=0, count=option.total)
+        for option in Option.objects.annotate(total=models.Count("voters"))
+    ]
+    OptionTally.objects.bulk_create(tallies, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('election', '0009_alter_election_preview_code'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OptionTally',
+            fields=[
+                ('id', models.UUIDField(db_index=True, default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('slot', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('option', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tallies', to='election.option')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='optiontally',
+            constraint=models.UniqueConstraint(fields=('option', 'slot'), name='unique_option_tally_slot'),
+        ),
+        migrations.RunPython(backfill_option_tallies, migrations.RunPython.noop),
+    ]
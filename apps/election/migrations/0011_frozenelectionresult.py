@@ -0,0 +1,25 @@
+# Generated by Django 4.0 on 2026-10-18 17:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('election', '0010_optiontally'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FrozenElectionResult',
+            fields=[
+                ('id', models.UUIDField(db_index=True, default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('document', models.JSONField()),
+                ('content_hash', models.CharField(max_length=64)),
+                ('frozen_at', models.DateTimeField(auto_now=True)),
+                ('election', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='frozen_result', to='election.election')),
+            ],
+        ),
+    ]
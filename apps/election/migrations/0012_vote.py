@@ -0,0 +1,46 @@
+# Generated by Django 4.0 on 2026-10-18 17:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0003_alter_voter_election'),
+        ('election', '0011_frozenelectionresult'),
+    ]
+
+    operations = [
+        # turn the auto-created Option.voters table into the Vote model
+        # without touching the table itself
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='Vote',
+                    fields=[
+                        ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                        ('option', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cast_votes', to='election.option')),
+                        ('voter', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cast_votes', to='voting.voter')),
+                    ],
+                    options={
+                        'db_table': 'election_option_voters',
+                        'unique_together': {('option', 'voter')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='option',
+                    name='voters',
+                    field=models.ManyToManyField(blank=True, related_name='voted_options', through='election.Vote', to='voting.Voter'),
+                ),
+            ],
+            database_operations=[],
+        ),
+        migrations.AddField(
+            model_name='vote',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
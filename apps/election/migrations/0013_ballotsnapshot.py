@@ -0,0 +1,33 @@
+# Generated by Django 4.0 on 2026-10-18 17:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('election', '0012_vote'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BallotSnapshot',
+            fields=[
+                ('id', models.UUIDField(db_index=True, default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('version', models.PositiveIntegerField()),
+                ('document', models.JSONField()),
+                ('content_hash', models.CharField(max_length=64)),
+                ('body', models.BinaryField()),
+                ('body_gzip', models.BinaryField()),
+                ('body_brotli', models.BinaryField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ballot_snapshots', to='election.election')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='ballotsnapshot',
+            constraint=models.UniqueConstraint(fields=('election', 'version'), name='unique_ballot_snapshot_version'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.0 on 2026-10-18 17:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('election', '0013_ballotsnapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='election',
+            index=models.Index(fields=['created_by', 'created_at'], name='election_owner_created_idx'),
+        ),
+    ]
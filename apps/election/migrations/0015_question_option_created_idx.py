@@ -0,0 +1,21 @@
+# Generated by Django 4.0 on 2026-10-18 17:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('election', '0014_election_owner_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ballotquestion',
+            index=models.Index(fields=['election', 'created_at'], name='question_election_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='option',
+            index=models.Index(fields=['ballot_question', 'created_at'], name='option_question_created_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.0 on 2026-10-18 17:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('election', '0015_question_option_created_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ballotquestion',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AddField(
+            model_name='option',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
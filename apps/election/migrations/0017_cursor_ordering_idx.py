@@ -0,0 +1,37 @@
+# Generated by Django 4.0 on 2026-10-18 18:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('election', '0016_image_variants'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ballotquestion',
+            name='question_election_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='election',
+            name='election_owner_created_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='option',
+            name='option_question_created_idx',
+        ),
+        migrations.AddIndex(
+            model_name='ballotquestion',
+            index=models.Index(fields=['election', 'created_at', 'id'], name='question_election_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='election',
+            index=models.Index(fields=['created_by', 'created_at', 'id'], name='election_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='option',
+            index=models.Index(fields=['ballot_question', 'created_at', 'id'], name='option_question_created_idx'),
+        ),
+    ]
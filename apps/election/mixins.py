@@ -0,0 +1,29 @@
+from django.shortcuts import get_object_or_404
+from .models import BallotQuestion, Election
+
+
+class ElectionLookupMixin:
+    """
+    for views nested under an election: the election of the URL (and the
+    ballot question, for views nested under one) is loaded with one query
+    and checked against the view's object permissions once per request
+    """
+
+    def get_election(self):
+        if not hasattr(self, "_election"):
+            self._election = get_object_or_404(
+                Election, id=self.kwargs.get("election_id")
+            )
+            self.check_object_permissions(self.request, self._election)
+        return self._election
+
+    def get_ballot_question(self):
+        if not hasattr(self, "_ballot_question"):
+            self._ballot_question = get_object_or_404(
+                BallotQuestion.objects.select_related("election"),
+                id=self.kwargs.get("question_id"),
+                election_id=self.kwargs.get("election_id"),
+            )
+            self.check_object_permissions(self.request, self._ballot_question)
+            self._election = self._ballot_question.election
+        return self._ballot_question
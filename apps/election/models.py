@@ -1,7 +1,12 @@
 from django.db import models
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 import uuid
+import random
 import secrets
 
 User = get_user_model()
@@ -23,6 +28,33 @@ class SettingTypeChoices(models.TextChoices):
     TEXT = "TEXT", _("TEXT")
 
 
+class ElectionQuerySet(models.QuerySet):
+    def with_ballot(self, options=True):
+        """prefetch ballot questions and their options in two queries"""
+        queryset = self.prefetch_related(
+            models.Prefetch(
+                "ballot_questions",
+                queryset=BallotQuestion.objects.order_by("created_at"),
+            )
+        )
+        if options:
+            queryset = queryset.prefetch_related(
+                models.Prefetch(
+                    "ballot_questions__options",
+                    queryset=Option.objects.order_by("created_at"),
+                )
+            )
+        return queryset
+
+    def with_settings(self):
+        return self.select_related("electionsetting").prefetch_related(
+            models.Prefetch(
+                "electionsetting__election_setting_parameters",
+                queryset=ElectionSettingParameter.objects.select_related("category"),
+            )
+        )
+
+
 # Create your models here.
 class Election(models.Model):
     id = models.UUIDField(
@@ -51,50 +83,37 @@ class Election(models.Model):
         choices=StatusChoices.choices, default=StatusChoices.BUILDING, max_length=50
     )
 
+    objects = ElectionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # keyset pagination of an owner's elections
+            models.Index(
+                fields=["created_by", "created_at", "id"],
+                name="election_owner_created_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.title
 
-    @property
-    def election_result(self):
-        result = {}
-        all_ballot_question_for_election = self.ballot_questions.all()
-        for ballot_question in all_ballot_question_for_election:
-            result[str(ballot_question.title)] = ballot_question.votes_analysis
-        print(result)
-        return result
+    @cached_property
+    def results(self):
+        from .results import ElectionResults
+
+        return ElectionResults(self)
 
     @property
-    def election_result_percentage(self):
-        result = {}
-        all_ballot_question_for_election = self.ballot_questions.all()
-        for ballot_question in all_ballot_question_for_election:
-            result[
-                str(ballot_question.title)
-            ] = ballot_question.votes_analysis_in_percentage
-        print(result)
-        return result
+    def election_result(self):
+        return self.results.election_result
 
     @property
     def election_result_percentage(self):
-        result = {}
-        all_ballot_question_for_election = self.ballot_questions.all()
-        for ballot_question in all_ballot_question_for_election:
-            result[
-                str(ballot_question.title)
-            ] = ballot_question.votes_analysis_in_percentage
-        print(result)
-        return result
+        return self.results.election_result_percentage
 
     @property
     def election_result_degree(self):
-        result = {}
-        all_ballot_question_for_election = self.ballot_questions.all()
-        for ballot_question in all_ballot_question_for_election:
-            result[
-                str(ballot_question.title)
-            ] = ballot_question.votes_analysis_in_degree
-        print(result)
-        return result
+        return self.results.election_result_degree
 
     @property
     def no_of_eligible_voters(self):
@@ -108,26 +127,13 @@ class Election(models.Model):
     def no_of_all_questions(self):
         return self.ballot_questions.all().count()
 
-    @property
-    def no_of_all_questions(self):
-        return self.ballot_questions.all().count()
-
     @property
     def no_of_all_voters_that_have_voted(self):
-        totals = self.all_voters_that_have_voted
-        return 0 if not totals else totals[0]
+        return self.results.no_of_all_voters_that_have_voted
 
     @property
     def all_voters_that_have_voted(self) -> list[int]:
-        totals = []
-        all_ballot_question_for_election = self.ballot_questions.all()
-        for ballot_question in all_ballot_question_for_election:
-            total_voters_for_options = [
-                option.votes_count for option in ballot_question.options.all()
-            ]
-            print(total_voters_for_options)
-            totals.append(sum(total_voters_for_options))
-        return totals
+        return self.results.all_voters_that_have_voted
 
     def get_mode(self, code):
         if self.status == StatusChoices.BUILDING and self.preview_code == code:
@@ -137,6 +143,70 @@ class Election(models.Model):
         return "INVALID"
 
 
+class FrozenElectionResult(models.Model):
+    """final results of an election, computed once after its end_date"""
+
+    id = models.UUIDField(
+        editable=False,
+        db_index=True,
+        default=uuid.uuid4,
+        primary_key=True,
+        null=False,
+        blank=False,
+    )
+    election = models.OneToOneField(
+        Election, related_name="frozen_result", on_delete=models.CASCADE
+    )
+    document = models.JSONField()
+    content_hash = models.CharField(max_length=64)
+    frozen_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.election.title} final result"
+
+    @property
+    def is_current(self):
+        # an end_date moved after freezing makes the document outdated
+        return self.frozen_at >= self.election.end_date
+
+
+class BallotSnapshot(models.Model):
+    """
+    Immutable compiled ballot of a launched election: its questions,
+    options, validation and settings, with the voter-facing response
+    rendered and precompressed once. Edits after launch add a new version.
+    """
+
+    id = models.UUIDField(
+        editable=False,
+        db_index=True,
+        default=uuid.uuid4,
+        primary_key=True,
+        null=False,
+        blank=False,
+    )
+    election = models.ForeignKey(
+        Election, related_name="ballot_snapshots", on_delete=models.CASCADE
+    )
+    version = models.PositiveIntegerField()
+    document = models.JSONField()
+    content_hash = models.CharField(max_length=64)
+    body = models.BinaryField()
+    body_gzip = models.BinaryField()
+    body_brotli = models.BinaryField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["election", "version"], name="unique_ballot_snapshot_version"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.election.title} ballot v{self.version}"
+
+
 class ElectionSetting(models.Model):
     id = models.UUIDField(
         editable=False,
@@ -219,6 +289,8 @@ class BallotQuestion(models.Model):
     short_description = models.CharField(max_length=1000)
     description = models.TextField()
     image = models.ImageField(upload_to="elections/", blank=True)
+    # resized copies of image, see apps.election.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     validation_choice_max = models.PositiveSmallIntegerField(default=1)
     validation_choice_min = models.PositiveSmallIntegerField(default=1)
@@ -229,6 +301,12 @@ class BallotQuestion(models.Model):
                 fields=["election", "title"], name="unique_elective_post"
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=["election", "created_at", "id"],
+                name="question_election_created_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -236,10 +314,11 @@ class BallotQuestion(models.Model):
     @property
     def votes_analysis(self):
         analysis = {}
-        all_options_for_question = self.options.all().order_by("voters")
+        all_options_for_question = self.options.annotate(
+            votes=Coalesce(Sum("tallies__count"), 0)
+        ).order_by("-votes", "title")
         for option in all_options_for_question:
-            analysis[str(option.title)] = option.votes_count
-        print(analysis)
+            analysis[str(option.title)] = option.votes
         return analysis
 
     @property
@@ -279,8 +358,12 @@ class Option(models.Model):
     short_description = models.CharField(max_length=1000)
     description = models.TextField()
     image = models.ImageField(upload_to="elections/", blank=True)
+    # resized copies of image, see apps.election.images
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
-    voters = models.ManyToManyField(Voter, related_name="voted_options", blank=True)
+    voters = models.ManyToManyField(
+        Voter, related_name="voted_options", blank=True, through="Vote"
+    )
 
     class Meta:
         constraints = [
@@ -288,6 +371,12 @@ class Option(models.Model):
                 fields=["ballot_question", "title"], name="unique_option"
             ),
         ]
+        indexes = [
+            models.Index(
+                fields=["ballot_question", "created_at", "id"],
+                name="option_question_created_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -307,4 +396,84 @@ class Option(models.Model):
 
     @property
     def votes_count(self):
-        return self.voters.count()
+        return self.tallies.aggregate(total=Coalesce(Sum("count"), 0))["total"]
+
+
+class Vote(models.Model):
+    """
+    A voter's choice of an option, the through table of Option.voters.
+    It keeps the table and columns Django created for the plain M2M.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    option = models.ForeignKey(
+        Option, related_name="cast_votes", on_delete=models.CASCADE
+    )
+    voter = models.ForeignKey(
+        "voting.Voter", related_name="cast_votes", on_delete=models.CASCADE
+    )
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        db_table = "election_option_voters"
+        unique_together = [("option", "voter")]
+
+    def __str__(self):
+        return f"{self.voter} - {self.option}"
+
+
+class OptionTallyManager(models.Manager):
+    def increment(self, option_ids, amount=1):
+        """add amount to one randomly picked slot of every option,
+        creating the slot rows on first use"""
+        slots = {
+            option_id: random.randrange(settings.OPTION_TALLY_SLOTS)
+            for option_id in option_ids
+        }
+        if not slots:
+            return 0
+        self.bulk_create(
+            [
+                self.model(option_id=option_id, slot=slot)
+                for option_id, slot in slots.items()
+            ],
+            ignore_conflicts=True,
+        )
+        condition = Q()
+        for option_id, slot in slots.items():
+            condition |= Q(option_id=option_id, slot=slot)
+        return self.filter(condition).update(count=F("count") + amount)
+
+
+class OptionTally(models.Model):
+    """
+    Maintained vote count of an option. The count is split across
+    OPTION_TALLY_SLOTS rows so concurrent voters for the same option
+    don't queue up on a single row lock; the tally is the sum of the slots.
+    """
+
+    id = models.UUIDField(
+        editable=False,
+        db_index=True,
+        default=uuid.uuid4,
+        primary_key=True,
+        null=False,
+        blank=False,
+    )
+    option = models.ForeignKey(
+        Option, related_name="tallies", on_delete=models.CASCADE
+    )
+    slot = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    objects = OptionTallyManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["option", "slot"], name="unique_option_tally_slot"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.option} - slot {self.slot}"
@@ -0,0 +1,214 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce, Trunc
+from django.utils import timezone
+from django.utils.functional import cached_property
+from .models import BallotQuestion, FrozenElectionResult, Vote
+import hashlib
+import json
+import time
+
+
+class ElectionResults:
+    """
+    Results of an election computed from a single grouped query over the
+    option tallies of every question. Percentages, degrees and totals are
+    derived in memory from that one result, so the number of queries does
+    not grow with the number of questions or options.
+    """
+
+    def __init__(self, election):
+        self.election = election
+        self.title = election.title
+
+    @cached_property
+    def votes(self):
+        rows = (
+            BallotQuestion.objects.filter(election=self.election)
+            .values("id", "title", "created_at", "options__id", "options__title")
+            .annotate(votes=Coalesce(Sum("options__tallies__count"), 0))
+            .order_by("created_at", "id", "-votes", "options__title")
+        )
+        result = {}
+        for row in rows:
+            analysis = result.setdefault(str(row["title"]), {})
+            if row["options__id"] is not None:
+                analysis[str(row["options__title"])] = row["votes"]
+        return result
+
+    @cached_property
+    def voter_counts(self):
+        return self.election.voters.aggregate(
+            all=Count("id"), eligible=Count("id", filter=Q(is_verified=True))
+        )
+
+    @property
+    def election_result(self):
+        return self.votes
+
+    @property
+    def election_result_percentage(self):
+        return self.scaled(100)
+
+    @property
+    def election_result_degree(self):
+        return self.scaled(360)
+
+    @property
+    def all_voters_that_have_voted(self) -> list[int]:
+        return [sum(analysis.values()) for analysis in self.votes.values()]
+
+    @property
+    def no_of_all_voters_that_have_voted(self):
+        totals = self.all_voters_that_have_voted
+        return 0 if not totals else totals[0]
+
+    @property
+    def no_of_eligible_voters(self):
+        return self.voter_counts["eligible"]
+
+    @property
+    def no_of_all_voters(self):
+        return self.voter_counts["all"]
+
+    def scaled(self, scale):
+        total_voters = self.no_of_all_voters_that_have_voted
+        return {
+            question: {
+                option: (votes / total_voters) * scale if total_voters else 0
+                for option, votes in analysis.items()
+            }
+            for question, analysis in self.votes.items()
+        }
+
+
+TURNOUT_BUCKETS = {"1m": "minute", "1h": "hour", "1d": "day"}
+
+
+def election_votes(election, as_of=None):
+    votes = Vote.objects.filter(option__ballot_question__election=election)
+    if as_of is not None:
+        votes = votes.filter(created_at__lte=as_of)
+    return votes
+
+
+def turnout(election, bucket, as_of=None):
+    """votes and distinct voters per time bucket, from one GROUP BY query"""
+    return list(
+        election_votes(election, as_of)
+        .annotate(bucket=Trunc("created_at", TURNOUT_BUCKETS[bucket]))
+        .values("bucket")
+        .annotate(votes=Count("id"), voters=Count("voter", distinct=True))
+        .order_by("bucket")
+    )
+
+
+def tallies_as_of(election, as_of):
+    """election_result as it stood at as_of, counted from the votes"""
+    rows = (
+        election_votes(election, as_of)
+        .values("option__ballot_question__title", "option__title")
+        .annotate(votes=Count("id"))
+        .order_by("option__ballot_question__created_at", "-votes", "option__title")
+    )
+    result = {}
+    for row in rows:
+        analysis = result.setdefault(str(row["option__ballot_question__title"]), {})
+        analysis[str(row["option__title"])] = row["votes"]
+    return result
+
+
+def results_version_key(election_id):
+    return f"election-results-version:{election_id}"
+
+
+def results_snapshot_key(election_id):
+    return f"election-results-snapshot:{election_id}"
+
+
+def results_lock_key(election_id):
+    return f"election-results-lock:{election_id}"
+
+
+def get_results_version(election_id):
+    return cache.get(results_version_key(election_id), 0)
+
+
+def bump_results_version(election_id):
+    """mark the cached results snapshot of the election as outdated"""
+    key = results_version_key(election_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        if cache.add(key, 1, timeout=None):
+            return 1
+        return cache.incr(key)
+
+
+def tallies_changed(election_id, deltas):
+    """called once a change of option tallies ({option_id: delta}) is committed"""
+    from .streams import publish_tally_deltas
+
+    version = bump_results_version(election_id)
+    publish_tally_deltas(election_id, deltas, version)
+
+
+def get_results_snapshot(election, compute):
+    """
+    Return the cached results snapshot of the election, calling compute()
+    to rebuild it when votes changed it more than
+    ELECTION_RESULTS_MAX_STALENESS_IN_SECS ago. Only the worker holding the
+    recompute lock rebuilds it, the others are served the previous snapshot.
+    Once the election has ended the snapshot is kept without expiry.
+    """
+    snapshot_key = results_snapshot_key(election.id)
+    version_key = results_version_key(election.id)
+    cached = cache.get_many([snapshot_key, version_key])
+    snapshot = cached.get(snapshot_key)
+    version = cached.get(version_key, 0)
+    now = time.time()
+    if snapshot is not None and (
+        snapshot["version"] == version
+        or now - snapshot["computed_at"]
+        < settings.ELECTION_RESULTS_MAX_STALENESS_IN_SECS
+    ):
+        return snapshot["data"]
+
+    lock_key = results_lock_key(election.id)
+    if not cache.add(
+        lock_key, now, timeout=settings.ELECTION_RESULTS_LOCK_TIMEOUT_IN_SECS
+    ):
+        if snapshot is not None:
+            return snapshot["data"]
+        # nobody has a snapshot to serve yet
+        return compute()
+    try:
+        data = compute()
+        has_ended = election.end_date <= timezone.now()
+        cache.set(
+            snapshot_key,
+            {"version": version, "computed_at": now, "data": data},
+            timeout=None
+            if has_ended
+            else settings.ELECTION_RESULTS_CACHE_TIMEOUT_IN_SECS,
+        )
+    finally:
+        cache.delete(lock_key)
+    return data
+
+
+def freeze_election_results(election):
+    """compute the final results of an ended election and store them"""
+    from .serializers import ElectionResultSerializer
+
+    document = ElectionResultSerializer(ElectionResults(election)).data
+    content = json.dumps(document, sort_keys=True, separators=(",", ":"))
+    frozen, _ = FrozenElectionResult.objects.update_or_create(
+        election=election,
+        defaults={
+            "document": document,
+            "content_hash": hashlib.sha256(content.encode()).hexdigest(),
+        },
+    )
+    return frozen
@@ -4,14 +4,19 @@ from .models import (
     Option,
     BallotQuestion,
     ElectionSetting,
-    ElectionSettingCategory,
     ElectionSettingParameter,
 )
 import secrets
+from django.db import transaction
 from apps.common.exceptions import BadRequest
+from apps.common.serializers import FieldSelectionMixin
+from .tasks import freeze_election_results_task
+from .images import get_srcset
 
 
 class OptionSerializer(serializers.ModelSerializer):
+    image_srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = Option
         fields = [
@@ -21,13 +26,18 @@ class OptionSerializer(serializers.ModelSerializer):
             "short_description",
             "description",
             "image",
+            "image_srcset",
             "created_at",
         ]
         read_only_fields = ["ballot_question"]
 
+    def get_image_srcset(self, obj):
+        return get_srcset(obj, self.context.get("request"))
+
 
 class BallotQuestionSerializer(serializers.ModelSerializer):
-    options = serializers.SerializerMethodField()
+    options = OptionSerializer(many=True, read_only=True)
+    image_srcset = serializers.SerializerMethodField()
 
     class Meta:
         model = BallotQuestion
@@ -38,6 +48,7 @@ class BallotQuestionSerializer(serializers.ModelSerializer):
             "short_description",
             "description",
             "image",
+            "image_srcset",
             "created_at",
             "validation_choice_max",
             "validation_choice_min",
@@ -45,12 +56,16 @@ class BallotQuestionSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ["election"]
 
-    def get_options(self, obj):
-        return OptionSerializer(obj.options.all(), many=True).data
+    def get_image_srcset(self, obj):
+        return get_srcset(obj, self.context.get("request"))
 
 
-class ElectionFullDetailSerializer(serializers.ModelSerializer):
-    ballot_questions = serializers.SerializerMethodField()
+class ElectionFullDetailSerializer(FieldSelectionMixin, serializers.ModelSerializer):
+    """expects elections fetched with Election.objects.with_ballot(), or
+    with the queryset prepared by for_request()"""
+
+    ballot_questions = BallotQuestionSerializer(many=True, read_only=True)
+    settings = serializers.SerializerMethodField()
 
     class Meta:
         model = Election
@@ -68,6 +83,7 @@ class ElectionFullDetailSerializer(serializers.ModelSerializer):
             "live_code",
             "preview_code",
             "ballot_questions",
+            "settings",
         ]
         read_only_fields = [
             "created_by",
@@ -75,29 +91,49 @@ class ElectionFullDetailSerializer(serializers.ModelSerializer):
             "live_code",
             "preview_code",
         ]
+        expandable_fields = {
+            "ballot_questions": "ballot_questions",
+            "options": "ballot_questions.options",
+            "settings": "settings",
+        }
+        default_expand = ["options"]
+
+    @classmethod
+    def for_request(cls, queryset, request):
+        """
+        only prefetch the relations the request expands and defer the
+        columns of the fields it leaves out
+        """
+        fields, expanded = cls.get_selection(request)
+        if "ballot_questions" in expanded:
+            queryset = queryset.with_ballot(
+                options="ballot_questions.options" in expanded
+            )
+        if "settings" in expanded:
+            queryset = queryset.with_settings()
+        if fields is not None:
+            columns = {field.name for field in Election._meta.concrete_fields}
+            # created_by for permissions, created_at for the cursor
+            queryset = queryset.only(
+                "id", "created_by", "created_at", *(fields & columns)
+            )
+        return queryset
 
-    def get_ballot_questions(self, obj):
-        return BallotQuestionSerializer(obj.ballot_questions.all(), many=True).data
-
-
-class ElectionResultSerializer(serializers.ModelSerializer):
-    # ballot_questions = serializers.SerializerMethodField()
+    def get_settings(self, obj):
+        return ElectionSettingParameterSerializer(
+            obj.electionsetting.configurations, many=True
+        ).data
 
-    class Meta:
-        model = Election
-        fields = [
-            "title",
-            "election_result",
-            "election_result_percentage",
-            "election_result_degree",
-            "no_of_eligible_voters",
-            "no_of_all_voters",
-            "no_of_all_voters_that_have_voted",
-        ]
-        read_only_fields = ["created_by"]
 
-    # def get_ballot_questions(self, obj):
-    #     return BallotQuestionSerializer(obj.ballot_questions.all(), many=True).data
+class ElectionResultSerializer(serializers.Serializer):
+    "serializes an ElectionResults instance"
+    title = serializers.CharField(read_only=True)
+    election_result = serializers.DictField(read_only=True)
+    election_result_percentage = serializers.DictField(read_only=True)
+    election_result_degree = serializers.DictField(read_only=True)
+    no_of_eligible_voters = serializers.IntegerField(read_only=True)
+    no_of_all_voters = serializers.IntegerField(read_only=True)
+    no_of_all_voters_that_have_voted = serializers.IntegerField(read_only=True)
 
 
 class ElectionSettingsSerializer(serializers.ModelSerializer):
@@ -167,12 +203,20 @@ class ElectionLaunchSerializer(serializers.ModelSerializer):
             # generate codes to be used for url in frontend
             self.instance.live_code = secrets.token_urlsafe(8)
             self.instance.status = "LIVE"
+            # saving a LIVE election compiles its ballot snapshot on commit
             self.instance.save()
+            election_id, end_date = str(self.instance.id), self.instance.end_date
+            transaction.on_commit(
+                lambda: freeze_election_results_task.apply_async(
+                    (election_id,), eta=end_date
+                )
+            )
         return self.instance.refresh_from_db()
 
 
 class ElectionAllDetailsSerializer(serializers.ModelSerializer):
-    "includes both election full detail (ballot questions + options + election details) and election setting"
+    """includes both election full detail (ballot questions + options + election details) and election setting
+    expects elections fetched with Election.objects.with_ballot().with_settings()"""
     election = serializers.SerializerMethodField()
     settings = serializers.SerializerMethodField()
 
@@ -4,18 +4,28 @@ from .models import (
     ElectionSetting,
     ElectionSettingParameter,
     ElectionSettingCategory,
+    BallotQuestion,
+    Option,
+    StatusChoices,
 )
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from . import utils
+from .results import bump_results_version
+from .ballots import ballot_changed, forget_ballot_codes, refresh_ballot_snapshot
+from .images import variants_outdated
+from .tasks import generate_image_variants_task
 import os
-import json
 
 logger = logging.getLogger(__name__)
 
 
 @receiver(post_save, sender=Election)
 def handle_election_post_save(sender, instance, created, **kwargs):
+    transaction.on_commit(lambda: bump_results_version(instance.id))
+    codes = [instance.live_code, instance.preview_code]
+    transaction.on_commit(lambda: forget_ballot_codes(codes))
     file_path = (
         f"{os.path.dirname(os.path.abspath(__file__))}/data/default_setting.json"
     )
@@ -35,6 +45,9 @@ def handle_election_post_save(sender, instance, created, **kwargs):
         logger.info(
             f"Done creating default election setting configuration for {instance.title}"
         )
+    if instance.status == StatusChoices.LIVE:
+        # registered last so the snapshot includes the settings created above
+        transaction.on_commit(lambda: refresh_ballot_snapshot(instance.id))
 
 
 def create_setting_parameters(parameters, election_setting):
@@ -48,3 +61,48 @@ def create_setting_parameters(parameters, election_setting):
         ElectionSettingParameter.objects.create(
             election_setting=election_setting, category=category, **parameter_detail
         )
+
+
+@receiver(post_save, sender=BallotQuestion)
+@receiver(post_delete, sender=BallotQuestion)
+def handle_ballot_question_change(sender, instance, **kwargs):
+    # the shape of the results changed, don't serve the cached snapshot
+    transaction.on_commit(lambda: bump_results_version(instance.election_id))
+    transaction.on_commit(lambda: ballot_changed(instance.election_id))
+
+
+@receiver(post_save, sender=Option)
+@receiver(post_delete, sender=Option)
+def handle_option_change(sender, instance, **kwargs):
+    election_id = (
+        BallotQuestion.objects.filter(id=instance.ballot_question_id)
+        .values_list("election_id", flat=True)
+        .first()
+    )
+    if election_id is not None:
+        transaction.on_commit(lambda: bump_results_version(election_id))
+        transaction.on_commit(lambda: ballot_changed(election_id))
+
+
+@receiver(post_save, sender=ElectionSettingParameter)
+def handle_setting_parameter_change(sender, instance, created, **kwargs):
+    if created:
+        # default parameters are created with the election, before launch
+        return
+    election_id = (
+        ElectionSetting.objects.filter(id=instance.election_setting_id)
+        .values_list("election_id", flat=True)
+        .first()
+    )
+    if election_id is not None:
+        transaction.on_commit(lambda: refresh_ballot_snapshot(election_id))
+
+
+@receiver(post_save, sender=BallotQuestion)
+@receiver(post_save, sender=Option)
+def handle_image_upload(sender, instance, **kwargs):
+    if variants_outdated(instance):
+        model_name, pk = sender._meta.model_name, str(instance.pk)
+        transaction.on_commit(
+            lambda: generate_image_variants_task.delay(model_name, pk)
+        )
@@ -0,0 +1,300 @@
+"""
+Live election results over Server-Sent Events.
+
+Votes publish the tally deltas they caused to a pub/sub channel. Every
+ASGI process keeps one subscription to that channel (Redis when
+RESULTS_PUBSUB_URL is set, an in-process fan-out otherwise) and hands
+each message to the streams of that election it is serving, so a single
+process holds many idle connections without polling the database.
+
+Deltas carry the results version they bumped and snapshots the version
+they were read at. A stream skips the deltas its snapshot already counts
+and sends a new snapshot when a version goes missing.
+"""
+import asyncio
+import json
+import logging
+import re
+import threading
+
+import redis
+import redis.asyncio as aioredis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "election-results:"
+STREAM_PATH = re.compile(
+    r"^/elections/(?P<election_id>[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})"
+    r"/results/stream$"
+)
+HEARTBEAT_IN_SECS = 15
+SNAPSHOT_ATTEMPTS = 3
+
+_publisher = None
+_publisher_lock = threading.Lock()
+
+
+def get_publisher():
+    global _publisher
+    if _publisher is None:
+        with _publisher_lock:
+            if _publisher is None:
+                _publisher = redis.Redis.from_url(settings.RESULTS_PUBSUB_URL)
+    return _publisher
+
+
+def publish_tally_deltas(election_id, deltas, version):
+    """
+    Announce the change of option tallies ({option_id: delta}) of an
+    election, and the results version it bumped, to every process
+    streaming its results.
+    """
+    message = json.dumps(
+        {
+            "election_id": str(election_id),
+            "version": version,
+            "deltas": {str(option_id): delta for option_id, delta in deltas.items()},
+        }
+    )
+    if settings.RESULTS_PUBSUB_URL:
+        try:
+            get_publisher().publish(f"{CHANNEL_PREFIX}{election_id}", message)
+        except redis.RedisError:
+            logger.exception(f"Could not publish tally deltas for {election_id}")
+        return
+    broker.publish_threadsafe(str(election_id), message)
+
+
+class ResultsBroker:
+    """fans pub/sub messages out to the streams open in this process"""
+
+    def __init__(self):
+        self.subscribers = {}
+        self.loop = None
+        self.listener = None
+
+    def subscribe(self, election_id):
+        self.start()
+        queue = asyncio.Queue()
+        self.subscribers.setdefault(election_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, election_id, queue):
+        queues = self.subscribers.get(election_id, set())
+        queues.discard(queue)
+        if not queues:
+            self.subscribers.pop(election_id, None)
+
+    def start(self):
+        if self.loop is not None:
+            return
+        self.loop = asyncio.get_running_loop()
+        if settings.RESULTS_PUBSUB_URL:
+            self.listener = self.loop.create_task(self.listen())
+
+    def dispatch(self, election_id, message):
+        for queue in self.subscribers.get(election_id, ()):
+            queue.put_nowait(message)
+
+    def publish_threadsafe(self, election_id, message):
+        # votes are saved from sync views running outside the event loop
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.dispatch, election_id, message)
+
+    async def listen(self):
+        while True:
+            client = aioredis.Redis.from_url(settings.RESULTS_PUBSUB_URL)
+            pubsub = client.pubsub()
+            try:
+                await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+                async for message in pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    try:
+                        channel = message["channel"].decode()
+                        self.dispatch(
+                            channel[len(CHANNEL_PREFIX) :], message["data"].decode()
+                        )
+                    except Exception:
+                        logger.exception(
+                            f"Could not dispatch results message {message!r}"
+                        )
+            except Exception:
+                # the listener serves every stream of the process, it must not die
+                logger.exception("Results pub/sub listener failed, reconnecting")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.close()
+                await client.close()
+
+
+broker = ResultsBroker()
+
+
+def parse_message(message):
+    try:
+        data = json.loads(message)
+        return int(data["version"]), {
+            str(option_id): int(delta) for option_id, delta in data["deltas"].items()
+        }
+    except (ValueError, TypeError, KeyError, AttributeError):
+        logger.warning(f"Skipping malformed tally deltas {message!r}")
+        return None
+
+
+def merge_deltas(messages, version):
+    """
+    Sum the deltas of messages newer than version, the snapshot sent so
+    far already counts the others. Returns the merged deltas and the
+    version reached, or None when a version is missing and the stream
+    needs a new snapshot.
+    """
+    parsed = sorted(filter(None, map(parse_message, messages)), key=lambda m: m[0])
+    deltas = {}
+    for message_version, message_deltas in parsed:
+        if message_version <= version:
+            continue
+        if message_version != version + 1:
+            return None
+        version = message_version
+        for option_id, delta in message_deltas.items():
+            deltas[option_id] = deltas.get(option_id, 0) + delta
+    deltas = {option_id: delta for option_id, delta in deltas.items() if delta}
+    return deltas, version
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+@sync_to_async
+def get_initial_results(election_id):
+    from .models import Election, Option
+    from .results import ElectionResults, get_results_version
+    from .serializers import ElectionResultSerializer
+
+    election = Election.objects.filter(id=election_id).first()
+    if election is None:
+        return None
+    options = {
+        str(id): {"question": question, "option": title}
+        for id, question, title in Option.objects.filter(
+            ballot_question__election=election
+        ).values_list("id", "ballot_question__title", "title")
+    }
+    # read from the database, a cached snapshot may be older than the deltas
+    # that follow it. Read again when votes came in meanwhile, as the version
+    # could then be ahead of what was counted.
+    for _ in range(SNAPSHOT_ATTEMPTS):
+        version = get_results_version(election.id)
+        results = ElectionResultSerializer(ElectionResults(election)).data
+        if get_results_version(election.id) == version:
+            break
+    return {"version": version, "results": results, "options": options}
+
+
+async def send_response(send, status, headers, body=b"", more_body=False):
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+
+async def stream_results(scope, receive, send, election_id):
+    if scope["method"] != "GET":
+        await send_response(send, 405, [(b"allow", b"GET")])
+        return
+    # subscribe before reading the snapshot, so the deltas of votes counted
+    # meanwhile wait in the queue instead of being missed
+    queue = broker.subscribe(election_id)
+    watcher = None
+    try:
+        initial = await get_initial_results(election_id)
+        if initial is None:
+            body = json.dumps(
+                {
+                    "status": "error",
+                    "message": "Election does not exist",
+                    "error": "",
+                }
+            ).encode()
+            await send_response(
+                send, 404, [(b"content-type", b"application/json")], body
+            )
+            return
+
+        disconnected = asyncio.Event()
+
+        async def watch_disconnect():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            disconnected.set()
+            queue.put_nowait(None)
+
+        watcher = asyncio.create_task(watch_disconnect())
+        await send_response(
+            send,
+            200,
+            [
+                (b"content-type", b"text/event-stream"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+            ],
+            format_event("snapshot", initial),
+            more_body=True,
+        )
+        version = initial["version"]
+        while not disconnected.is_set():
+            try:
+                message = await asyncio.wait_for(queue.get(), HEARTBEAT_IN_SECS)
+            except asyncio.TimeoutError:
+                chunk = b": heartbeat\n\n"
+            else:
+                if message is None:
+                    break
+                # coalesce whatever piled up while we were sending
+                messages = [message]
+                while not queue.empty():
+                    message = queue.get_nowait()
+                    if message is not None:
+                        messages.append(message)
+                merged = merge_deltas(messages, version)
+                if merged is None:
+                    # a delta was lost, start the client over from the database
+                    initial = await get_initial_results(election_id)
+                    if initial is None:
+                        break
+                    version = initial["version"]
+                    chunk = format_event("snapshot", initial)
+                else:
+                    deltas, version = merged
+                    if not deltas:
+                        continue
+                    chunk = format_event(
+                        "tally", {"version": version, "deltas": deltas}
+                    )
+            await send(
+                {"type": "http.response.body", "body": chunk, "more_body": True}
+            )
+    finally:
+        broker.unsubscribe(election_id, queue)
+        if watcher is not None:
+            watcher.cancel()
+
+
+def results_stream_application(fallback):
+    """
+    Wrap the Django ASGI application, serving
+    /elections/<id>/results/stream from here and anything else from Django.
+    """
+
+    async def application(scope, receive, send):
+        if scope["type"] == "http":
+            match = STREAM_PATH.match(scope["path"])
+            if match is not None:
+                return await stream_results(
+                    scope, receive, send, match.group("election_id")
+                )
+        return await fallback(scope, receive, send)
+
+    return application
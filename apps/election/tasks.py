@@ -0,0 +1,68 @@
+import logging
+from celery import shared_task
+from django.db.models import F
+from django.utils import timezone
+from .models import BallotQuestion, Election, Option, StatusChoices
+from .results import freeze_election_results
+from .images import (
+    delete_image_variants,
+    generate_image_variants,
+    variant_names,
+    variants_outdated,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def freeze_election_results_task(election_id):
+    election = Election.objects.filter(id=election_id).first()
+    if election is None or election.end_date > timezone.now():
+        # deleted, or the end_date was moved after this was scheduled
+        return None
+    logger.info(f"Freezing final results of {election.title}")
+    return freeze_election_results(election).content_hash
+
+
+@shared_task
+def freeze_ended_elections_task():
+    """freeze ended elections whose scheduled freeze did not run"""
+    elections = Election.objects.filter(
+        status=StatusChoices.LIVE, end_date__lte=timezone.now()
+    ).exclude(frozen_result__frozen_at__gte=F("end_date"))
+    for election in elections:
+        logger.info(f"Freezing final results of {election.title}")
+        freeze_election_results(election)
+    return len(elections)
+
+
+IMAGE_MODELS = {"ballotquestion": BallotQuestion, "option": Option}
+
+
+@shared_task
+def generate_image_variants_task(model_name, pk):
+    """generate the resized variants of a ballot question or option image"""
+    from .ballots import ballot_changed
+
+    model = IMAGE_MODELS[model_name]
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None or not variants_outdated(instance):
+        return None
+    storage = instance.image.storage
+    previous = instance.image_variants
+    variants = generate_image_variants(instance.image) if instance.image else {}
+    # the image may have been replaced meanwhile, its own task handles that
+    updated = model.objects.filter(pk=pk, image=instance.image.name or "").update(
+        image_variants=variants
+    )
+    if not updated:
+        delete_image_variants(storage, variants)
+        return None
+    delete_image_variants(storage, previous, keep=variant_names(variants))
+    if isinstance(instance, Option):
+        election_id = instance.ballot_question.election_id
+    else:
+        election_id = instance.election_id
+    # serve the new srcset from the cached and compiled ballots
+    ballot_changed(election_id)
+    return variants
@@ -1,3 +1,131 @@
-from django.test import TestCase
+import datetime
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from apps.accounts.authentication import user_cache
+from apps.accounts.models import CustomUser
+from apps.voting.tests import BallotTestCase
+from .ballots import get_ballot_snapshot
+from .models import Election, Option, OptionTally
+from .results import freeze_election_results
+
+
+class OrganizerTestCase(BallotTestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def results(self):
+        response = self.client.get(f"/elections/{self.election.id}/results")
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()["data"]
+
+
+class ResultsTest(OrganizerTestCase):
+    def test_results_count_the_ballots(self):
+        self.vote(self.voter, [self.choice(self.questions[0], 0, 1)])
+        self.vote(self.other_voter, [self.choice(self.questions[0], 1)])
+        data = self.results()
+        self.assertEqual(
+            data["election_result"]["Question 0"],
+            {"Option 1": 2, "Option 0": 1, "Option 2": 0},
+        )
+        self.assertAlmostEqual(
+            data["election_result_percentage"]["Question 0"]["Option 1"], 200 / 3
+        )
+        self.assertEqual(data["no_of_all_voters_that_have_voted"], 3)
+        self.assertEqual(data["no_of_eligible_voters"], 2)
+
+    @override_settings(ELECTION_RESULTS_MAX_STALENESS_IN_SECS=0)
+    def test_cached_results_are_refreshed_once_votes_change_them(self):
+        option = self.options[self.questions[0].id][0]
+        self.assertEqual(self.results()["election_result"]["Question 0"]["Option 0"], 0)
+        # a tally changed behind the back of the cache is not seen
+        OptionTally.objects.increment([option.id])
+        self.assertEqual(self.results()["election_result"]["Question 0"]["Option 0"], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vote(self.voter, [self.choice(self.questions[0], 0)])
+        self.assertEqual(self.results()["election_result"]["Question 0"]["Option 0"], 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(f"/elections/voters/{self.voter.id}")
+        self.assertEqual(self.results()["election_result"]["Question 0"]["Option 0"], 1)
+
+    def test_frozen_results_are_revalidated(self):
+        self.vote(self.voter, [self.choice(self.questions[0], 0)])
+        Election.objects.filter(id=self.election.id).update(
+            end_date=timezone.now() - datetime.timedelta(minutes=1)
+        )
+        frozen = freeze_election_results(Election.objects.get(id=self.election.id))
+        response = self.client.get(f"/elections/{self.election.id}/results")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["ETag"], f'"{frozen.content_hash}"')
+        self.assertIn("must-revalidate", response["Cache-Control"])
+        self.assertEqual(
+            response.json()["data"]["election_result"]["Question 0"]["Option 0"], 1
+        )
+        response = self.client.get(
+            f"/elections/{self.election.id}/results",
+            HTTP_IF_NONE_MATCH=response["ETag"],
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_turnout(self):
+        self.vote(self.voter, [self.choice(self.questions[0], 0, 1)])
+        self.vote(self.other_voter, [self.choice(self.questions[1], 0)])
+        response = self.client.get(f"/elections/{self.election.id}/turnout?bucket=1d")
+        self.assertEqual(response.status_code, 200)
+        [bucket] = response.json()["data"]["turnout"]
+        self.assertEqual((bucket["votes"], bucket["voters"]), (3, 2))
+        response = self.client.get(f"/elections/{self.election.id}/turnout?bucket=1s")
+        self.assertEqual(response.status_code, 400)
+
+    def test_results_of_another_organizer_are_read_only(self):
+        other = CustomUser.objects.create_user(
+            email="other@example.com", password="password", username="other"
+        )
+        self.client.force_authenticate(other)
+        response = self.client.get(f"/elections/{self.election.id}/turnout")
+        self.assertEqual(response.status_code, 403)
+
+
+class BallotByCodeTest(OrganizerTestCase):
+    def get(self, **headers):
+        return APIClient().get("/elections/LIVECODE", **headers)
+
+    def test_ballot_is_served_from_its_snapshot(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Cache-Control"], "no-cache")
+        data = response.json()["data"]
+        self.assertEqual(data["mode"], "LIVE")
+        self.assertEqual(len(data["ballot_questions"]), 2)
+        self.assertEqual(get_ballot_snapshot(self.election.id).version, 1)
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+    def test_ballot_change_compiles_a_new_snapshot(self):
+        etag = self.get()["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            Option.objects.create(
+                ballot_question=self.questions[0],
+                title="Option 3",
+                short_description="short",
+                description="description",
+            )
+        self.assertEqual(get_ballot_snapshot(self.election.id).version, 2)
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        options = response.json()["data"]["ballot_questions"][0]["options"]
+        self.assertIn("Option 3", [option["title"] for option in options])
+
+    def test_unknown_code(self):
+        self.assertEqual(APIClient().get("/elections/NOCODE").status_code, 404)
+
+
+class UserCacheTest(OrganizerTestCase):
+    def test_saving_a_user_evicts_it_from_the_cache(self):
+        user_cache.set(self.user.id, self.user)
+        self.user.save()
+        self.assertIsNone(user_cache.get(self.user.id))
@@ -7,6 +7,7 @@ from .views import (
     OptionRetrieveUpdateDeleteView,
     ElectionRetrieveUpdateDeleteView,
     ElectionResultView,
+    ElectionTurnoutView,
     ElectionSettingView,
     ElectionLaunchView,
     ElectionByCodeView,
@@ -34,6 +35,11 @@ urlpatterns = [
         ElectionResultView,
         name="election_result",
     ),
+    path(
+        "<uuid:election_id>/turnout",
+        ElectionTurnoutView,
+        name="election_turnout",
+    ),
     path(
         "<uuid:election_id>/settings",
         ElectionSettingView,
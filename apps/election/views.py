@@ -1,11 +1,9 @@
-from rest_framework.views import APIView
 from rest_framework import generics
 from .serializers import (
     ElectionFullDetailSerializer,
     OptionSerializer,
     BallotQuestionSerializer,
     ElectionResultSerializer,
-    ElectionSettingsSerializer,
     ElectionSettingParameterSerializer,
     ElectionLaunchSerializer,
     ElectionAllDetailsSerializer,
@@ -15,14 +13,36 @@ from .models import (
     BallotQuestion,
     Option,
     ElectionSetting,
-    ElectionSettingParameter,
+    FrozenElectionResult,
+)
+from .results import (
+    ElectionResults,
+    get_results_snapshot,
+    turnout,
+    tallies_as_of,
+    TURNOUT_BUCKETS,
+)
+from .ballots import (
+    compile_ballot_snapshot,
+    get_ballot_payload,
+    get_ballot_snapshot,
+    snapshot_payload,
 )
 from rest_framework.response import Response
+from django.http import HttpResponse, HttpResponseNotModified
 from rest_framework import status
+from apps.common.pagination import EnvelopeCursorPagination
+from apps.common.renderers import envelope, render_json
 from apps.common.permissions import IsOwnerOrReadOnly, IsOwner
+from django.conf import settings
 from django.shortcuts import get_object_or_404
-from django.db.models import Q
+from django.db.models import Prefetch
 from rest_framework.exceptions import NotFound
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from apps.common.exceptions import BadRequest
+from .mixins import ElectionLookupMixin
+import hashlib
 
 
 class ElectionListCreateView(generics.ListCreateAPIView):
@@ -31,30 +51,28 @@ class ElectionListCreateView(generics.ListCreateAPIView):
     created by the authenticated user
     """
 
+    pagination_class = EnvelopeCursorPagination
     serializer_class = ElectionFullDetailSerializer
 
     def get_queryset(self):
-        return Election.objects.filter(created_by=self.request.user)
+        return self.serializer_class.for_request(
+            Election.objects.filter(created_by=self.request.user), self.request
+        )
 
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
     def list(self, request, *args, **kwargs):
         data = super().list(request, *args, **kwargs).data
-        data = {
-            "status": "success",
-            "message": "All Elections created by the authenticated user fetched successfully",
-            "data": data,
-        }
+        data = envelope(
+            message="All Elections created by the authenticated user fetched successfully",
+            **data,
+        )
         return Response(data, status=status.HTTP_200_OK)
 
     def create(self, request, *args, **kwargs):
         data = super().create(request, *args, **kwargs).data
-        data = {
-            "status": "success",
-            "message": f"Election - {data.get('title')} created successfully",
-            "data": data,
-        }
+        data = envelope(data, f"Election - {data.get('title')} created successfully")
         return Response(data, status=status.HTTP_200_OK)
 
 
@@ -69,7 +87,11 @@ class ElectionRetrieveUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
     lookup_url_kwarg = "election_id"
 
     def get_queryset(self):
-        return Election.objects.all()
+        if self.request.query_params.get("type") == "full":
+            return Election.objects.with_ballot().with_settings()
+        return ElectionFullDetailSerializer.for_request(
+            Election.objects.all(), self.request
+        )
 
     def get_serializer_class(self):
         print(f"{self.request.query_params.get('type')=}")
@@ -79,67 +101,51 @@ class ElectionRetrieveUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
 
     def retrieve(self, request, *args, **kwargs):
         data = super().retrieve(request, *args, **kwargs).data
-        data = {
-            "status": "success",
-            "message": f"Election - {data.get('title')} retrieved successfully",
-            "data": data,
-        }
+        data = envelope(data, f"Election - {data.get('title')} retrieved successfully")
         return Response(data, status=status.HTTP_200_OK)
 
     def update(self, request, *args, **kwargs):
         data = super().update(request, *args, **kwargs).data
-        data = {
-            "status": "success",
-            "message": f"Election - {data.get('id')} updated successfully",
-            "data": data,
-        }
+        data = envelope(data, f"Election - {data.get('id')} updated successfully")
         return Response(data, status=status.HTTP_200_OK)
 
     def destroy(self, request, *args, **kwargs):
         data = super().destroy(request, *args, **kwargs).data
-        data = {
-            "status": "success",
-            "message": f"Election deleted successfully",
-            "data": data,
-        }
+        data = envelope(data, f"Election deleted successfully")
         return Response(data, status=status.HTTP_204_NO_CONTENT)
 
 
-class BallotQuestionView(generics.ListCreateAPIView):
+class BallotQuestionView(ElectionLookupMixin, generics.ListCreateAPIView):
     """
     view to create and list ballot questions under an election
     created by the authenticated user
     """
 
+    pagination_class = EnvelopeCursorPagination
     serializer_class = BallotQuestionSerializer
     permission_classes = [IsOwnerOrReadOnly]
 
     def get_queryset(self):
-        election = get_object_or_404(Election, id=self.kwargs.get("election_id"))
-        self.check_object_permissions(self.request, election)
-        return BallotQuestion.objects.all()
+        return self.get_election().ballot_questions.prefetch_related(
+            Prefetch("options", queryset=Option.objects.order_by("created_at"))
+        )
 
     def perform_create(self, serializer):
-        election = get_object_or_404(Election, id=self.kwargs.get("election_id"))
-        self.check_object_permissions(self.request, election)
-        serializer.save(election=election)
+        serializer.save(election=self.get_election())
 
     def list(self, request, *args, **kwargs):
         data = super().list(request, *args, **kwargs).data
-        data = {
-            "status": "success",
-            "message": "All Ballot Questions for this election fetched successfully",
-            "data": data,
-        }
+        data = envelope(
+            message="All Ballot Questions for this election fetched successfully",
+            **data,
+        )
         return Response(data, status=status.HTTP_200_OK)
 
     def create(self, request, *args, **kwargs):
         data = super().create(request, *args, **kwargs).data
-        data = {
-            "status": "success",
-            "message": f"Ballot Question - {data.get('title')} created successfully",
-            "data": data,
-        }
+        data = envelope(
+            data, f"Ballot Question - {data.get('title')} created successfully"
+        )
         return Response(data, status=status.HTTP_200_OK)
 
 
@@ -155,73 +161,54 @@ class BallotQuestionRetrieveUpdateDeleteView(generics.RetrieveUpdateDestroyAPIVi
     lookup_url_kwarg = "question_id"
 
     def get_queryset(self):
-        return BallotQuestion.objects.all()
+        # the election is needed for the ownership check
+        return BallotQuestion.objects.select_related("election")
 
     def retrieve(self, request, *args, **kwargs):
         data = super().retrieve(request, *args, **kwargs).data
-        data = {
-            "status": "success",
-            "message": f"Ballot question - {data.get('title')} retrieved successfully",
-            "data": data,
-        }
+        data = envelope(
+            data, f"Ballot question - {data.get('title')} retrieved successfully"
+        )
         return Response(data, status=status.HTTP_200_OK)
 
     def update(self, request, *args, **kwargs):
         data = super().update(request, *args, **kwargs).data
-        data = {
-            "status": "success",
-            "message": f"Ballot question - {data.get('id')} updated successfully",
-            "data": data,
-        }
+        data = envelope(
+            data, f"Ballot question - {data.get('id')} updated successfully"
+        )
         return Response(data, status=status.HTTP_200_OK)
 
     def destroy(self, request, *args, **kwargs):
         data = super().destroy(request, *args, **kwargs).data
-        data = {
-            "status": "success",
-            "message": f"Ballot question deleted successfully",
-            "data": data,
-        }
+        data = envelope(data, f"Ballot question deleted successfully")
         return Response(data, status=status.HTTP_204_NO_CONTENT)
 
 
-class OptionListCreateView(generics.ListCreateAPIView):
+class OptionListCreateView(ElectionLookupMixin, generics.ListCreateAPIView):
     """
     view to create options for a ballot question
     """
 
+    pagination_class = EnvelopeCursorPagination
     serializer_class = OptionSerializer
     permission_classes = [IsOwnerOrReadOnly]
 
     def get_queryset(self):
-        election = get_object_or_404(Election, id=self.kwargs.get("election_id"))
-        self.check_object_permissions(self.request, election)
-        return Option.objects.all()
+        return self.get_ballot_question().options.all()
 
     def perform_create(self, serializer):
-        election = get_object_or_404(Election, id=self.kwargs.get("election_id"))
-        ballot_question = get_object_or_404(
-            election.ballot_questions, id=self.kwargs.get("question_id")
-        )
-        self.check_object_permissions(self.request, ballot_question)
-        serializer.save(ballot_question=ballot_question)
+        serializer.save(ballot_question=self.get_ballot_question())
 
     def list(self, request, *args, **kwargs):
         data = super().list(request, *args, **kwargs).data
-        data = {
-            "status": "success",
-            "message": "All Options for this ballot question fetched successfully",
-            "data": data,
-        }
+        data = envelope(
+            message="All Options for this ballot question fetched successfully", **data
+        )
         return Response(data, status=status.HTTP_200_OK)
 
     def create(self, request, *args, **kwargs):
         data = super().create(request, *args, **kwargs).data
-        data = {
-            "status": "success",
-            "message": f"Option - {data.get('title')} created successfully",
-            "data": data,
-        }
+        data = envelope(data, f"Option - {data.get('title')} created successfully")
         return Response(data, status=status.HTTP_200_OK)
 
 
@@ -237,33 +224,22 @@ class OptionRetrieveUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
     lookup_url_kwarg = "option_id"
 
     def get_queryset(self):
-        return Option.objects.all()
+        # the election is needed for the ownership check
+        return Option.objects.select_related("ballot_question__election")
 
     def retrieve(self, request, *args, **kwargs):
         data = super().retrieve(request, *args, **kwargs).data
-        data = {
-            "status": "success",
-            "message": f"Option - {data.get('title')} retrieved successfully",
-            "data": data,
-        }
+        data = envelope(data, f"Option - {data.get('title')} retrieved successfully")
         return Response(data, status=status.HTTP_200_OK)
 
     def update(self, request, *args, **kwargs):
         data = super().update(request, *args, **kwargs).data
-        data = {
-            "status": "success",
-            "message": f"Option - {data.get('id')} updated successfully",
-            "data": data,
-        }
+        data = envelope(data, f"Option - {data.get('id')} updated successfully")
         return Response(data, status=status.HTTP_200_OK)
 
     def destroy(self, request, *args, **kwargs):
         data = super().destroy(request, *args, **kwargs).data
-        data = {
-            "status": "success",
-            "message": f"Option deleted successfully",
-            "data": data,
-        }
+        data = envelope(data, f"Option deleted successfully")
         return Response(data, status=status.HTTP_204_NO_CONTENT)
 
 
@@ -272,15 +248,70 @@ class ElectionResultView(generics.RetrieveAPIView):
     permission_classes = [IsOwnerOrReadOnly]
     lookup_field = "id"
     lookup_url_kwarg = "election_id"
-    queryset = Election.objects.all()
+    queryset = Election.objects.select_related("frozen_result")
 
     def retrieve(self, request, *args, **kwargs):
-        data = super().retrieve(request, *args, **kwargs).data
-        data = {
-            "status": "success",
-            "message": f"Election result for - {data.get('title')} retrieved successfully",
-            "data": data,
+        election = self.get_object()
+        try:
+            frozen_result = election.frozen_result
+        except FrozenElectionResult.DoesNotExist:
+            frozen_result = None
+        if frozen_result is not None and frozen_result.is_current:
+            return self.frozen_response(request, election, frozen_result)
+        data = get_results_snapshot(
+            election, lambda: self.get_serializer(ElectionResults(election)).data
+        )
+        data = envelope(
+            data, f"Election result for - {data.get('title')} retrieved successfully"
+        )
+        return Response(data, status=status.HTTP_200_OK)
+
+    def frozen_response(self, request, election, frozen_result):
+        """
+        frozen results rarely change, but can be frozen again, so clients
+        and proxies keep them briefly and then revalidate their ETag
+        """
+        max_age = settings.ELECTION_FROZEN_RESULTS_MAX_AGE_IN_SECS
+        headers = {
+            "ETag": f'"{frozen_result.content_hash}"',
+            "Cache-Control": f"public, max-age={max_age}, must-revalidate",
         }
+        if headers["ETag"] in request.headers.get("If-None-Match", ""):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        data = envelope(
+            frozen_result.document,
+            f"Election result for - {election.title} retrieved successfully",
+        )
+        return Response(data, status=status.HTTP_200_OK, headers=headers)
+
+
+class ElectionTurnoutView(ElectionLookupMixin, generics.GenericAPIView):
+    """
+    votes cast per time bucket (?bucket=1m|1h|1d), optionally
+    only up to a point in time (?as_of=<ISO 8601>) with the tallies then
+    """
+
+    permission_classes = [IsOwner]
+
+    def get(self, request, election_id):
+        election = self.get_election()
+        bucket = request.query_params.get("bucket", "1m")
+        if bucket not in TURNOUT_BUCKETS:
+            raise BadRequest(
+                f"bucket must be one of {', '.join(TURNOUT_BUCKETS)}"
+            )
+        as_of = request.query_params.get("as_of")
+        if as_of is not None:
+            as_of = parse_datetime(as_of)
+            if as_of is None:
+                raise BadRequest("as_of must be an ISO 8601 date and time")
+            if timezone.is_naive(as_of):
+                as_of = timezone.make_aware(as_of)
+        data = {"bucket": bucket, "turnout": turnout(election, bucket, as_of)}
+        if as_of is not None:
+            data["as_of"] = as_of
+            data["election_result"] = tallies_as_of(election, as_of)
+        data = envelope(data, f"Turnout for {election.title} retrieved successfully")
         return Response(data, status=status.HTTP_200_OK)
 
 
@@ -291,7 +322,9 @@ class ElectionSettingView(generics.GenericAPIView):
     def get(self, request, election_id):
         category = request.query_params.get("category", None)
 
-        election_setting = get_object_or_404(ElectionSetting, election__id=election_id)
+        election_setting = get_object_or_404(
+            ElectionSetting.objects.select_related("election"), election__id=election_id
+        )
         election = election_setting.election
         print(election)
         self.check_object_permissions(request, election)
@@ -303,45 +336,41 @@ class ElectionSettingView(generics.GenericAPIView):
             serializer = self.serializer_class(
                 instance=election_setting.configurations, many=True
             )
-        data = {
-            "status": "success",
-            "message": f"Election setting for {election.title} retrieved successfully",
-            "data": serializer.data,
-        }
+        data = envelope(
+            serializer.data,
+            f"Election setting for {election.title} retrieved successfully",
+        )
         return Response(data, status=status.HTTP_200_OK)
 
     def patch(self, request, election_id):
-        election_setting = get_object_or_404(ElectionSetting, election__id=election_id)
+        election_setting = get_object_or_404(
+            ElectionSetting.objects.select_related("election"), election__id=election_id
+        )
         election = election_setting.election
         print(election)
         self.check_object_permissions(request, election)
-        instance = ElectionSettingParameter.objects.get(id=request.data.pop("id"))
+        instance = get_object_or_404(
+            election_setting.configurations, id=request.data.pop("id")
+        )
         serializer = self.serializer_class(instance, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
-        data = {
-            "status": "success",
-            "message": "Election setting Updated Successfully",
-            "data": serializer.data,
-        }
+        data = envelope(serializer.data, "Election setting Updated Successfully")
         return Response(data, status.HTTP_200_OK)
 
 
-class ElectionLaunchView(generics.GenericAPIView):
+class ElectionLaunchView(ElectionLookupMixin, generics.GenericAPIView):
     serializer_class = ElectionLaunchSerializer
     permission_classes = [IsOwner]
 
     def get(self, request, election_id):
-        election = get_object_or_404(Election, id=self.kwargs.get("election_id"))
-        self.check_object_permissions(self.request, election)
+        election = self.get_election()
         serializer = self.serializer_class(instance=election)
         serializer.save()
         data = serializer.data
-        data = {
-            "status": "success",
-            "message": f"Election {election.title} launched successfully",
-            "data": serializer.data,
-        }
+        data = envelope(
+            serializer.data, f"Election {election.title} launched successfully"
+        )
         return Response(data, status=status.HTTP_200_OK)
 
 
@@ -350,21 +379,67 @@ class ElectionByCodeView(generics.GenericAPIView):
     permission_classes = []
 
     def get(self, request, election_code):
-        election = Election.objects.filter(
-            Q(live_code=election_code) | Q(preview_code=election_code)
-        ).first()
-        if election is None:
+        payload = get_ballot_payload(
+            election_code, lambda election: self.build_payload(election, election_code)
+        )
+        if payload is None:
             raise NotFound("Election with this code does not exist")
+        encoding = self.pick_encoding(request, payload)
+        etag = payload["etag"]
+        if encoding:
+            etag = f'{etag[:-1]}-{encoding}"'
+        if etag in request.headers.get("If-None-Match", ""):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(
+                payload[encoding or "body"], content_type="application/json"
+            )
+            if encoding:
+                response["Content-Encoding"] = encoding
+        response["ETag"] = etag
+        response["Cache-Control"] = "no-cache"
+        response["Vary"] = "Accept-Encoding"
+        return response
+
+    @staticmethod
+    def pick_encoding(request, payload):
+        accepted = set()
+        for part in request.headers.get("Accept-Encoding", "").split(","):
+            coding, _, quality = part.replace(" ", "").partition(";q=")
+            try:
+                if quality and float(quality) == 0:
+                    continue
+            except ValueError:
+                pass
+            accepted.add(coding)
+        for encoding in ("br", "gzip"):
+            if encoding in accepted and encoding in payload:
+                return encoding
+        return None
+
+    def build_payload(self, election, election_code):
+        """
+        A live election is served from its compiled snapshot, a preview
+        is rendered from the ballot tables.
+        """
+        if election.get_mode(election_code) == "LIVE":
+            snapshot = get_ballot_snapshot(election.id) or compile_ballot_snapshot(
+                election.id
+            )
+            return snapshot_payload(snapshot)
+        body = self.render_ballot(
+            Election.objects.with_ballot().get(id=election.id), election_code
+        )
+        return {"etag": f'"{hashlib.sha256(body).hexdigest()}"', "body": body}
+
+    def render_ballot(self, election, election_code):
+        """the response body, rendered once per code and election change"""
         serializer = self.serializer_class(election)
         data = serializer.data
         election_mode = election.get_mode(election_code)
         data.setdefault("mode", election_mode)
-        data = {
-            "status": "success",
-            "message": f"Election {election.title} retrieved successfully",
-            "data": data,
-        }
-        return Response(data, status=status.HTTP_200_OK)
+        data = envelope(data, f"Election {election.title} retrieved successfully")
+        return render_json(data)
 
 
 ElectionListCreateView = ElectionListCreateView.as_view()
@@ -376,6 +451,7 @@ BallotQuestionRetrieveUpdateDeleteView = (
 OptionListCreateView = OptionListCreateView.as_view()
 OptionRetrieveUpdateDeleteView = OptionRetrieveUpdateDeleteView.as_view()
 ElectionResultView = ElectionResultView.as_view()
+ElectionTurnoutView = ElectionTurnoutView.as_view()
 ElectionSettingView = ElectionSettingView.as_view()
 ElectionLaunchView = ElectionLaunchView.as_view()
 ElectionByCodeView = ElectionByCodeView.as_view()
@@ -1,8 +1,37 @@
 from django.contrib import admin
-from .models import Voter
+from .models import OutboxEmail, Voter, VoterImportJob
 
 
 # Register your models here.
 @admin.register(Voter)
 class VoterAdmin(admin.ModelAdmin):
     list_display = ["id", "election", "email", "is_verified"]
+
+
+@admin.register(VoterImportJob)
+class VoterImportJobAdmin(admin.ModelAdmin):
+    list_display = [
+        "id",
+        "election",
+        "status",
+        "rows_processed",
+        "rows_rejected",
+        "created_at",
+    ]
+
+
+@admin.register(OutboxEmail)
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = [
+        "id",
+        "recipient",
+        "template",
+        "provider",
+        "status",
+        "attempts",
+        "next_attempt_at",
+        "sent_at",
+    ]
+    list_filter = ["status", "provider", "template"]
+    # the context of a pending credentials mail holds the raw pass key
+    exclude = ["context"]
@@ -1,24 +1,66 @@
+import uuid
+
 from rest_framework import authentication, exceptions
 from django.conf import settings
 import jwt
+from apps.common.caches import LRUCache
 from .models import Voter
 
 
+# cached voters are shared between requests and must not be modified,
+# saving or deleting a voter evicts it (see signals)
+voter_cache = LRUCache(
+    settings.VOTER_AUTH_CACHE_SIZE, settings.VOTER_AUTH_CACHE_TIMEOUT_IN_SECS
+)
+
+
 class VoterJWTAuthentication(authentication.BaseAuthentication):
+    """
+    Bearer tokens issued by VoterLoginSerializer. The claims carry the
+    voter_id, election_id and is_verified of the voter, so a voter found in
+    the voter cache is authenticated without a query.
+    """
+
+    keyword = "Bearer"
+
     def authenticate(self, request):
-        auth_data = authentication.get_authorization_header(request)
-        if not auth_data:
+        auth = authentication.get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
             return None
-        prefix, token = auth_data.decode("utf-8").split(" ")
-        # issues when  pass_name changes  the token is no longer valid
-        # hence the reason for the User.DoesNotExist exception
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed("Invalid token header")
+        try:
+            token = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed("Invalid token header")
         try:
             payload = jwt.decode(
                 token, settings.VOTER_JWT_SECRET_KEY, algorithms=["HS256"]
             )
-            voter = Voter.objects.get(pass_name=payload.get("pass_name"))
-            return (voter, token)
-        except (jwt.DecodeError, Voter.DoesNotExist) as e:
-            raise exceptions.AuthenticationFailed("Your token is invalid")
         except jwt.ExpiredSignatureError:
             raise exceptions.AuthenticationFailed("Your Token has expired!")
+        except jwt.InvalidTokenError:
+            raise exceptions.AuthenticationFailed("Your token is invalid")
+        return (self.get_voter(payload), token)
+
+    def get_voter(self, payload):
+        try:
+            voter_id = str(uuid.UUID(payload.get("voter_id")))
+            election_id = uuid.UUID(payload.get("election_id"))
+        except (TypeError, ValueError, AttributeError):
+            raise exceptions.AuthenticationFailed("Your token is invalid")
+        if not payload.get("is_verified"):
+            raise exceptions.AuthenticationFailed("Voter's email is not verified")
+        voter = voter_cache.get(voter_id)
+        if voter is None:
+            try:
+                voter = Voter.objects.get(id=voter_id, election_id=election_id)
+            except Voter.DoesNotExist:
+                raise exceptions.AuthenticationFailed("Your token is invalid")
+            voter_cache.set(voter_id, voter)
+        elif voter.election_id != election_id:
+            raise exceptions.AuthenticationFailed("Your token is invalid")
+        return voter
+
+    def authenticate_header(self, request):
+        return self.keyword
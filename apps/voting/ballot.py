@@ -0,0 +1,148 @@
+import uuid
+from collections import defaultdict
+from apps.election.models import Election, BallotQuestion, Option, Vote
+from apps.election.ballots import get_ballot_snapshot
+
+
+def parse_uuid(value):
+    try:
+        return uuid.UUID(str(value))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+class BallotPlan:
+    """
+    Everything needed to validate a submitted ballot, loaded once
+    with a fixed number of queries whatever the size of the ballot:
+    the election, the referenced questions, the referenced options
+    and the choices the voter already made on those questions.
+    Launched elections are read from their latest BallotSnapshot.
+    """
+
+    def __init__(self, election, questions, option_questions, voted_options):
+        self.election = election
+        self.questions = questions
+        self.option_questions = option_questions
+        self.voted_options = voted_options
+        self.voted_counts = defaultdict(int)
+        for question_id, option_id in voted_options:
+            self.voted_counts[question_id] += 1
+
+    @classmethod
+    def load(cls, election_id, voter, items):
+        question_ids, option_ids = cls.referenced_ids(items)
+        election = Election.objects.filter(id=election_id).first()
+        snapshot = None
+        if election is not None:
+            snapshot = get_ballot_snapshot(election.id, fields=["document"])
+        if snapshot is not None:
+            return cls.from_document(
+                election, snapshot.document, voter, question_ids, option_ids
+            )
+        # not launched yet, read the ballot tables
+        questions = {}
+        if election is not None and question_ids:
+            questions = {
+                question.id: question
+                for question in BallotQuestion.objects.filter(
+                    election=election, id__in=question_ids
+                ).only("id", "election", "validation_choice_max", "validation_choice_min")
+            }
+        option_questions = {}
+        if option_ids:
+            option_questions = dict(
+                Option.objects.filter(id__in=option_ids).values_list(
+                    "id", "ballot_question_id"
+                )
+            )
+        voted_options = set()
+        if questions:
+            voted_options = set(
+                Vote.objects.filter(
+                    voter_id=voter.id, option__ballot_question_id__in=questions
+                ).values_list("option__ballot_question_id", "option_id")
+            )
+        return cls(election, questions, option_questions, voted_options)
+
+    @classmethod
+    def from_document(cls, election, document, voter, question_ids, option_ids):
+        """plan a ballot against the compiled snapshot of a launched election"""
+        questions, option_questions, question_options = {}, {}, {}
+        for item in document["ballot_questions"]:
+            question_id = uuid.UUID(item["id"])
+            ids = [uuid.UUID(option["id"]) for option in item["options"]]
+            if question_id in question_ids:
+                questions[question_id] = BallotQuestion(
+                    id=question_id,
+                    election=election,
+                    validation_choice_max=item["validation_choice_max"],
+                    validation_choice_min=item["validation_choice_min"],
+                )
+                question_options[question_id] = ids
+            for option_id in ids:
+                if option_id in option_ids:
+                    option_questions[option_id] = question_id
+        voted_options = set()
+        if questions:
+            option_question = {
+                option_id: question_id
+                for question_id, ids in question_options.items()
+                for option_id in ids
+            }
+            voted_options = {
+                (option_question[option_id], option_id)
+                for option_id in Vote.objects.filter(
+                    voter_id=voter.id, option_id__in=option_question
+                ).values_list("option_id", flat=True)
+            }
+        return cls(election, questions, option_questions, voted_options)
+
+    @staticmethod
+    def referenced_ids(items):
+        question_ids, option_ids = set(), set()
+        if not isinstance(items, list):
+            return question_ids, option_ids
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            question_id = parse_uuid(item.get("ballot_question_id"))
+            if question_id is not None:
+                question_ids.add(question_id)
+            choices = item.get("choices")
+            if not isinstance(choices, list):
+                continue
+            for choice in choices:
+                option_id = parse_uuid(
+                    choice.get("option_id") if isinstance(choice, dict) else None
+                )
+                if option_id is not None:
+                    option_ids.add(option_id)
+        return question_ids, option_ids
+
+    def get_question(self, question_id):
+        return self.questions.get(parse_uuid(question_id))
+
+    def options_exist(self, option_ids):
+        return all(parse_uuid(id) in self.option_questions for id in option_ids)
+
+    def options_belong_to(self, question, option_ids):
+        return all(
+            self.option_questions.get(parse_uuid(id)) == question.id
+            for id in option_ids
+        )
+
+    def has_voted_any(self, question, option_ids):
+        return any(
+            (question.id, parse_uuid(id)) in self.voted_options for id in option_ids
+        )
+
+    def voted_count(self, question):
+        return self.voted_counts[question.id]
+
+    def claim(self, question, option_ids):
+        """record choices accepted earlier in the same ballot so a
+        question repeated in one submission is validated as a whole"""
+        for id in option_ids:
+            self.voted_options.add((question.id, parse_uuid(id)))
+        self.voted_counts[question.id] += len(option_ids)
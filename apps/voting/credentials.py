@@ -0,0 +1,90 @@
+"""
+Credential issuance for verified voters.
+
+Verifying only flips Voter.is_verified; the pass keys of the verified voters
+of an election without one are generated and hashed here, in chunks of
+CREDENTIAL_ISSUANCE_CHUNK_SIZE voters. The hashes are computed on a thread
+pool: PBKDF2 runs in hashlib.pbkdf2_hmac, which releases the GIL, so the
+threads hash on every core. No row is locked while hashing; a chunk's pass
+keys are then written with one bulk_update and its credential mails queued
+in the outbox in one short transaction, so no voter ends up with a pass key
+that was never mailed. Voters issued by a concurrent job meanwhile keep
+their pass key.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from .models import Voter
+from .outbox import context_builder, enqueue_emails
+from .utils import generate_password
+
+logger = logging.getLogger(__name__)
+
+CREDENTIALS_TEMPLATE = "voting/voter_cred.html"
+CREDENTIALS_SUBJECT = "Votex - Your Voter's Credentials"
+
+
+@context_builder(CREDENTIALS_TEMPLATE)
+def credentials_context(email):
+    return {
+        "election_title": email.voter.election.title,
+        "pass_name": email.voter.pass_name,
+        "pass_key": email.context["pass_key"],
+    }
+
+
+def voters_without_credentials(election_id):
+    return Voter.objects.filter(
+        election_id=election_id, is_verified=True, pass_key=""
+    )
+
+
+def issue_chunk(pool, election, size):
+    """
+    issue the credentials of a chunk of voters. Returns (voters picked,
+    voters issued): voters a concurrent job issued meanwhile are skipped.
+    """
+    voter_ids = list(
+        voters_without_credentials(election.id)
+        .order_by("id")
+        .values_list("id", flat=True)[:size]
+    )
+    if not voter_ids:
+        return 0, 0
+    # hashed before any row is locked, hashing a chunk takes seconds
+    raw_passwords = dict(zip(voter_ids, (generate_password() for _ in voter_ids)))
+    pass_keys = dict(zip(voter_ids, pool.map(make_password, raw_passwords.values())))
+    with transaction.atomic():
+        voters = list(
+            voters_without_credentials(election.id)
+            .filter(id__in=voter_ids)
+            .select_for_update()
+        )
+        for voter in voters:
+            voter.pass_key = pass_keys[voter.id]
+        Voter.objects.bulk_update(voters, ["pass_key"])
+        messages = [(voter, {"pass_key": raw_passwords[voter.id]}) for voter in voters]
+        enqueue_emails(CREDENTIALS_TEMPLATE, CREDENTIALS_SUBJECT, messages)
+    return len(voter_ids), len(voters)
+
+
+def issue_credentials(election, on_issued=None):
+    """
+    issue the credentials of every verified voter of an election without
+    one. on_issued is called with the number issued after every chunk.
+    """
+    issued, size = 0, settings.CREDENTIAL_ISSUANCE_CHUNK_SIZE
+    with ThreadPoolExecutor(max_workers=settings.CREDENTIAL_HASHING_WORKERS) as pool:
+        while True:
+            picked, count = issue_chunk(pool, election, size)
+            if not picked:
+                break
+            issued += count
+            if count and on_issued is not None:
+                on_issued(count)
+    logger.info(f"Issued credentials to {issued} voters of {election.id}")
+    return issued
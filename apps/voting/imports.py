@@ -0,0 +1,239 @@
+"""
+CSV voter roll imports.
+
+The uploaded file is read as a stream in chunks of VOTER_IMPORT_CHUNK_SIZE
+rows, so memory use does not grow with the size of the roll. Every chunk is
+normalized, checked against the election with one query and upserted on
+(election, email) in its own transaction: uploading the same roll again
+updates phone numbers instead of failing or duplicating voters. On
+PostgreSQL a chunk is loaded with COPY into a temporary staging table and
+moved with a single INSERT ... SELECT ... ON CONFLICT.
+"""
+import csv
+import io
+import itertools
+import logging
+
+import phonenumbers
+from django.conf import settings
+from django.contrib.auth.base_user import BaseUserManager
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ImportStatusChoices, Voter, VoterImportJob
+from .utils import generate_unique_pass_names
+
+logger = logging.getLogger(__name__)
+
+EMAIL_COLUMNS = ("email",)
+PHONE_COLUMNS = ("phone_number", "phone")
+UPSERT_COLUMNS = (
+    "id",
+    "election_id",
+    "email",
+    "phone_number",
+    "pass_name",
+    "created_at",
+)
+
+
+class InvalidRollError(Exception):
+    pass
+
+
+def read_chunks(file, size):
+    """yield lists of (line, email, phone number) from a CSV file opened in binary"""
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text)
+    if reader.fieldnames is None:
+        raise InvalidRollError("The file is empty")
+    columns = {name.strip().lower(): name for name in reader.fieldnames if name}
+    email_column = next((columns[c] for c in EMAIL_COLUMNS if c in columns), None)
+    phone_column = next((columns[c] for c in PHONE_COLUMNS if c in columns), None)
+    if email_column is None or phone_column is None:
+        raise InvalidRollError("The file needs an email and a phone_number column")
+    rows = (
+        (reader.line_num, row.get(email_column), row.get(phone_column))
+        for row in reader
+    )
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def normalize_phone_number(value, region):
+    number = phonenumbers.parse(value, region)
+    if not phonenumbers.is_valid_number(number):
+        raise ValueError("Invalid phone number")
+    return phonenumbers.format_number(number, phonenumbers.PhoneNumberFormat.E164)
+
+
+def normalize_chunk(election_id, chunk, region):
+    """
+    (voters, rejections) of a chunk: voters maps each accepted email to its
+    E.164 phone number and line. Phone numbers already used by another voter
+    of the election are rejected with one query for the whole chunk.
+    """
+    voters, phone_owners, rejections = {}, {}, []
+    for line, email, phone_number in chunk:
+        email = BaseUserManager.normalize_email((email or "").strip())
+        try:
+            validate_email(email)
+        except ValidationError:
+            rejections.append({"row": line, "error": "Invalid email"})
+            continue
+        try:
+            phone_number = normalize_phone_number((phone_number or "").strip(), region)
+        except (phonenumbers.NumberParseException, ValueError):
+            rejections.append({"row": line, "error": "Invalid phone number"})
+            continue
+        if email in voters or phone_number in phone_owners:
+            rejections.append({"row": line, "error": "Duplicate row in this chunk"})
+            continue
+        voters[email] = (phone_number, line)
+        phone_owners[phone_number] = (line, email)
+
+    taken = Voter.objects.filter(
+        election_id=election_id, phone_number__in=phone_owners
+    ).values_list("phone_number", "email")
+    for phone_number, owner in taken:
+        line, email = phone_owners[str(phone_number)]
+        if owner != email:
+            del voters[email]
+            rejections.append(
+                {"row": line, "error": "Phone number belongs to another voter"}
+            )
+    return voters, rejections
+
+
+def voter_rows(election_id, voters):
+    pass_names = generate_unique_pass_names(Voter, len(voters))
+    id_field, election_field = Voter._meta.pk, Voter._meta.get_field("election")
+    created_at = Voter._meta.get_field("created_at").get_db_prep_value(
+        timezone.now(), connection
+    )
+    for pass_name, (email, (phone_number, _)) in zip(pass_names, voters.items()):
+        yield (
+            id_field.get_db_prep_value(id_field.get_default(), connection),
+            election_field.get_db_prep_value(election_id, connection),
+            email,
+            phone_number,
+            pass_name,
+            created_at,
+        )
+
+
+def upsert_sql(source):
+    columns = ", ".join(UPSERT_COLUMNS)
+    # pass_name, pass_key and is_verified of existing voters are kept
+    return (
+        f"INSERT INTO {Voter._meta.db_table} ({columns}, pass_key, is_verified) "
+        f"{source} "
+        "ON CONFLICT (election_id, email) "
+        "DO UPDATE SET phone_number = EXCLUDED.phone_number"
+    )
+
+
+def copy_upsert(cursor, rows):
+    """load the chunk with COPY and upsert it from the staging table"""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    # only the copied columns: pass_key and is_verified are NOT NULL in the
+    # voter table and filled in by the upsert
+    columns = ", ".join(
+        f"{name} {Voter._meta.get_field(name).db_type(connection)}"
+        for name in UPSERT_COLUMNS
+    )
+    cursor.execute(
+        f"CREATE TEMPORARY TABLE voter_import_staging ({columns}) ON COMMIT DROP"
+    )
+    cursor.copy_expert(
+        f"COPY voter_import_staging ({', '.join(UPSERT_COLUMNS)}) "
+        "FROM STDIN WITH (FORMAT csv)",
+        buffer,
+    )
+    cursor.execute(
+        upsert_sql(
+            f"SELECT {', '.join(UPSERT_COLUMNS)}, '', false FROM voter_import_staging"
+        )
+    )
+    # dropped right away too, for chunks upserted inside an outer transaction
+    cursor.execute("DROP TABLE voter_import_staging")
+
+
+def upsert_voters(election_id, voters):
+    """upsert a normalized chunk, returning the ids of the new voters"""
+    existing = set(
+        Voter.objects.filter(election_id=election_id, email__in=voters).values_list(
+            "email", flat=True
+        )
+    )
+    rows = list(voter_rows(election_id, voters))
+    with transaction.atomic(), connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            copy_upsert(cursor, rows)
+        else:
+            placeholders = ", ".join(["%s"] * len(UPSERT_COLUMNS))
+            cursor.executemany(
+                upsert_sql(f"VALUES ({placeholders}, '', false)"), rows
+            )
+    return [str(row[0]) for row in rows if row[2] not in existing]
+
+
+def run_import(job, on_created=None):
+    """
+    import the roll of a running job, reporting progress after every chunk.
+    on_created is called with the ids of the new voters of every chunk.
+    """
+    region = getattr(settings, "PHONENUMBER_DEFAULT_REGION", None)
+    rejections = list(job.rejections)
+    try:
+        with job.file.open("rb") as file:
+            for chunk in read_chunks(file, settings.VOTER_IMPORT_CHUNK_SIZE):
+                voters, rejected = normalize_chunk(job.election_id, chunk, region)
+                imported = len(voters)
+                try:
+                    created = upsert_voters(job.election_id, voters) if voters else []
+                except IntegrityError:
+                    # a concurrent change took one of the phone numbers
+                    logger.exception(f"Could not upsert a chunk of import {job.id}")
+                    imported, created = 0, []
+                    rejected += [
+                        {"row": line, "error": "Conflicted with another voter"}
+                        for _, line in voters.values()
+                    ]
+                if created and on_created is not None:
+                    on_created(created)
+                room = settings.VOTER_IMPORT_MAX_REPORTED_REJECTIONS - len(rejections)
+                rejections += rejected[: max(room, 0)]
+                VoterImportJob.objects.filter(id=job.id).update(
+                    rows_processed=F("rows_processed") + imported,
+                    rows_rejected=F("rows_rejected") + len(rejected),
+                    rejections=rejections,
+                )
+    except (InvalidRollError, UnicodeDecodeError, csv.Error) as error:
+        logger.warning(f"Voter import {job.id} failed: {error}")
+        VoterImportJob.objects.filter(id=job.id).update(
+            status=ImportStatusChoices.FAILED,
+            error=str(error),
+            finished_at=timezone.now(),
+        )
+        return
+    except Exception as error:
+        # anything else would leave the job RUNNING, and claimed for good
+        logger.exception(f"Voter import {job.id} crashed")
+        VoterImportJob.objects.filter(id=job.id).update(
+            status=ImportStatusChoices.FAILED,
+            error=f"Import stopped unexpectedly: {type(error).__name__}",
+            finished_at=timezone.now(),
+        )
+        raise
+    VoterImportJob.objects.filter(id=job.id).update(
+        status=ImportStatusChoices.COMPLETED, finished_at=timezone.now()
+    )
@@ -0,0 +1,112 @@
+"""
+Bounded pool verifying voter pass keys.
+
+check_password spends its time in PBKDF2, so when polls open and every
+voter logs in at once, hashing on every request thread of a process
+oversubscribes the cores and every login slows down together. Pass keys are
+verified instead on LOGIN_VERIFICATION_WORKERS threads (hashlib releases the
+GIL) while request threads wait for their result. At most
+LOGIN_VERIFICATION_MAX_QUEUE logins wait for a worker; beyond that a login
+is turned away at once so the client retries, rather than timing out behind
+the queue.
+
+The pool belongs to one process. It assumes WEB_CONCURRENCY processes
+serving many requests each on threads (gunicorn -k gthread --threads N),
+the cores divided between them. A process serving one request at a time,
+such as a gunicorn sync worker or Django's ASGI handler, which runs sync
+views on a single thread, never queues a login: there the number of
+processes is what bounds hashing.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password
+
+logger = logging.getLogger(__name__)
+
+
+class VerificationPoolFull(Exception):
+    pass
+
+
+class VerificationPool:
+    def __init__(self, workers, max_queue):
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="login-verification"
+        )
+        self.slots = threading.BoundedSemaphore(workers + max_queue)
+        self.lock = threading.Lock()
+        self.queue_depth = 0
+        self.stats = {
+            "verified": 0,
+            "rejected": 0,
+            "max_queue_depth": 0,
+            "wait_secs": 0.0,
+            "max_wait_secs": 0.0,
+            "hash_secs": 0.0,
+        }
+
+    def check_password(self, raw_password, encoded):
+        """check_password on a worker, VerificationPoolFull when the queue is full"""
+        if not self.slots.acquire(blocking=False):
+            with self.lock:
+                self.stats["rejected"] += 1
+            logger.warning(f"Login verification pool full: {self.metrics()}")
+            raise VerificationPoolFull()
+        try:
+            with self.lock:
+                self.queue_depth += 1
+                self.stats["max_queue_depth"] = max(
+                    self.stats["max_queue_depth"], self.queue_depth
+                )
+            future = self.executor.submit(
+                self.verify, raw_password, encoded, time.perf_counter()
+            )
+            return future.result()
+        finally:
+            self.slots.release()
+
+    def verify(self, raw_password, encoded, submitted_at):
+        started_at = time.perf_counter()
+        with self.lock:
+            self.queue_depth -= 1
+            wait = started_at - submitted_at
+            self.stats["wait_secs"] += wait
+            self.stats["max_wait_secs"] = max(self.stats["max_wait_secs"], wait)
+        try:
+            return check_password(raw_password, encoded)
+        finally:
+            with self.lock:
+                self.stats["verified"] += 1
+                self.stats["hash_secs"] += time.perf_counter() - started_at
+
+    def metrics(self):
+        """queue depth now, and wait and hashing times since the pool started"""
+        with self.lock:
+            stats = dict(self.stats, queue_depth=self.queue_depth)
+        verified = stats["verified"] or 1
+        stats["mean_wait_ms"] = round(stats["wait_secs"] / verified * 1000, 2)
+        stats["mean_hash_ms"] = round(stats["hash_secs"] / verified * 1000, 2)
+        return stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_verification_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = VerificationPool(
+                settings.LOGIN_VERIFICATION_WORKERS,
+                settings.LOGIN_VERIFICATION_MAX_QUEUE,
+            )
+        return _pool
+
+
+def verify_pass_key(raw_password, encoded):
+    return get_verification_pool().check_password(raw_password, encoded)
@@ -0,0 +1,34 @@
+# Generated by Django 4.0 on 2026-10-18 17:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('election', '0016_image_variants'),
+        ('accounts', '0003_alter_student_matric_no'),
+        ('voting', '0003_alter_voter_election'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoterImportJob',
+            fields=[
+                ('id', models.UUIDField(db_index=True, default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('file', models.FileField(upload_to='voter-imports/')),
+                ('status', models.CharField(choices=[('PENDING', 'PENDING'), ('RUNNING', 'RUNNING'), ('COMPLETED', 'COMPLETED'), ('FAILED', 'FAILED')], default='PENDING', max_length=50)),
+                ('rows_processed', models.PositiveIntegerField(default=0)),
+                ('rows_rejected', models.PositiveIntegerField(default=0)),
+                ('rejections', models.JSONField(blank=True, default=list)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.customuser')),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='voter_imports', to='election.election')),
+            ],
+        ),
+    ]
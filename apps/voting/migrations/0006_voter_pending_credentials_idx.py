@@ -0,0 +1,17 @@
+# Generated by Django 4.0 on 2026-10-18 17:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0005_outboxemail'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='voter',
+            index=models.Index(condition=models.Q(('is_verified', True), ('pass_key', '')), fields=['election'], name='voter_pending_credentials_idx'),
+        ),
+    ]
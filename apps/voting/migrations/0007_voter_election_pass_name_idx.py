@@ -0,0 +1,17 @@
+# Generated by Django 4.0 on 2026-10-18 17:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0006_voter_pending_credentials_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='voter',
+            index=models.Index(fields=['election', 'pass_name'], name='voter_election_pass_name_idx'),
+        ),
+    ]
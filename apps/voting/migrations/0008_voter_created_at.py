@@ -0,0 +1,24 @@
+# Generated by Django 4.0 on 2026-10-18 18:09
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0007_voter_election_pass_name_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voter',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='voter',
+            index=models.Index(fields=['election', 'created_at', 'id'], name='voter_election_created_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.0 on 2026-10-18 18:12
+
+from urllib.parse import urlsplit
+
+from django.db import migrations, models
+
+
+def keep_unbuildable_context(apps, schema_editor):
+    """pending mails keep only the site url of their link, or their pass key"""
+    OutboxEmail = apps.get_model("voting", "OutboxEmail")
+    for email in OutboxEmail.objects.filter(status="PENDING").exclude(context={}):
+        if "link" in email.context:
+            url = urlsplit(email.context["link"])
+            email.context = {"site_url": f"{url.scheme}://{url.netloc}/"}
+        elif "pass_key" in email.context:
+            email.context = {"pass_key": email.context["pass_key"]}
+        else:
+            continue
+        email.save(update_fields=["context"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('voting', '0008_voter_created_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_unbuildable_context, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name='outboxemail',
+            name='unique_outbox_email_voter_template',
+        ),
+        migrations.AddConstraint(
+            model_name='outboxemail',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'PENDING')), fields=('voter', 'template'), name='unique_pending_outbox_email'),
+        ),
+    ]
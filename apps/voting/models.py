@@ -1,5 +1,8 @@
+from django.conf import settings
 from django.db import models
 from django.db.models import Q
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 from apps.election.models import Election
 from phonenumber_field.modelfields import PhoneNumberField
 import uuid
@@ -22,6 +25,7 @@ class Voter(models.Model):
     pass_name = models.CharField(max_length=100, blank=True)
     pass_key = models.CharField(max_length=100, blank=True)
     is_verified = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
         # email or phone_number should be unique together with election
@@ -35,3 +39,126 @@ class Voter(models.Model):
                 name="unique_voter_phone_number",
             ),
         ]
+        indexes = [
+            # keyset pagination of an election's voters
+            models.Index(
+                fields=["election", "created_at", "id"],
+                name="voter_election_created_idx",
+            ),
+            models.Index(
+                fields=["election", "pass_name"],
+                name="voter_election_pass_name_idx",
+            ),
+            # verified voters still waiting for their credentials
+            models.Index(
+                fields=["election"],
+                condition=Q(is_verified=True, pass_key=""),
+                name="voter_pending_credentials_idx",
+            ),
+        ]
+
+
+class ImportStatusChoices(models.TextChoices):
+    PENDING = "PENDING", _("PENDING")
+    RUNNING = "RUNNING", _("RUNNING")
+    COMPLETED = "COMPLETED", _("COMPLETED")
+    FAILED = "FAILED", _("FAILED")
+
+
+class VoterImportJob(models.Model):
+    """an uploaded CSV voter roll imported in the background"""
+
+    id = models.UUIDField(
+        editable=False,
+        db_index=True,
+        default=uuid.uuid4,
+        primary_key=True,
+        null=False,
+        blank=False,
+    )
+    election = models.ForeignKey(
+        Election, on_delete=models.CASCADE, related_name="voter_imports"
+    )
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    file = models.FileField(upload_to="voter-imports/")
+    status = models.CharField(
+        choices=ImportStatusChoices.choices,
+        default=ImportStatusChoices.PENDING,
+        max_length=50,
+    )
+    rows_processed = models.PositiveIntegerField(default=0)
+    rows_rejected = models.PositiveIntegerField(default=0)
+    # the first VOTER_IMPORT_MAX_REPORTED_REJECTIONS rejected rows and why
+    rejections = models.JSONField(default=list, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.election.title} voter import - {self.status}"
+
+    @property
+    def rows_per_sec(self):
+        if self.started_at is None:
+            return 0
+        elapsed = ((self.finished_at or timezone.now()) - self.started_at).total_seconds()
+        rows = self.rows_processed + self.rows_rejected
+        return round(rows / elapsed, 1) if elapsed > 0 else rows
+
+
+class EmailStatusChoices(models.TextChoices):
+    PENDING = "PENDING", _("PENDING")
+    SENT = "SENT", _("SENT")
+    FAILED = "FAILED", _("FAILED")
+
+
+class OutboxEmail(models.Model):
+    """a voter mail waiting in, or sent from, the email outbox"""
+
+    id = models.UUIDField(
+        editable=False,
+        db_index=True,
+        default=uuid.uuid4,
+        primary_key=True,
+        null=False,
+        blank=False,
+    )
+    voter = models.ForeignKey(Voter, on_delete=models.CASCADE, related_name="emails")
+    template = models.CharField(max_length=255)
+    subject = models.CharField(max_length=255)
+    recipient = models.EmailField()
+    # only what cannot be rebuilt when the mail is sent, which may be a raw
+    # pass key; cleared once the mail is sent or given up on
+    context = models.JSONField(default=dict, blank=True)
+    # key of EMAIL_OUTBOX_PROVIDERS the mail is sent through
+    provider = models.CharField(max_length=50)
+    status = models.CharField(
+        choices=EmailStatusChoices.choices,
+        default=EmailStatusChoices.PENDING,
+        max_length=50,
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # sent mails don't keep the voter from being mailed again
+            models.UniqueConstraint(
+                fields=["voter", "template"],
+                condition=Q(status="PENDING"),
+                name="unique_pending_outbox_email",
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["provider", "status", "next_attempt_at"],
+                name="outbox_email_due_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.template} to {self.recipient} - {self.status}"
@@ -0,0 +1,283 @@
+"""
+Persistent outbox for voter mails.
+
+Mails are queued as OutboxEmail rows, at most one pending per (voter,
+template), and sent by a single runner per provider. A row stores only the
+context that cannot be rebuilt; the rest is filled in by the context builder
+of its template when it is sent, from the voter as it is then. Every provider of
+EMAIL_OUTBOX_PROVIDERS has a token bucket kept in the cache: it refills at
+"rate" mails per second up to "burst" mails, so a backlog drains at the
+highest rate the provider accepts. A failed mail is retried with jittered
+exponential backoff; a failure of the provider itself (connection refused,
+4xx throttling, authentication) also pauses its bucket, so queued mails do
+not hammer a server that is already refusing them.
+"""
+import logging
+import random
+import smtplib
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .models import EmailStatusChoices, OutboxEmail
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROVIDER = "default"
+
+
+def provider_settings(provider):
+    return settings.EMAIL_OUTBOX_PROVIDERS[provider]
+
+
+def bucket_key(provider):
+    return f"email-outbox-bucket:{provider}"
+
+
+def update_bucket(provider, update):
+    """
+    apply update(tokens, rate, burst) -> (new tokens, result) to the refilled
+    bucket of a provider while holding its lock, None when it is held elsewhere
+    """
+    limits = provider_settings(provider)
+    lock_key = f"{bucket_key(provider)}:lock"
+    if not cache.add(lock_key, 1, timeout=5):
+        return None
+    try:
+        now = time.time()
+        tokens, updated_at = cache.get(bucket_key(provider), (limits["burst"], now))
+        tokens = min(limits["burst"], tokens + (now - updated_at) * limits["rate"])
+        tokens, result = update(tokens, limits["rate"], limits["burst"])
+        cache.set(bucket_key(provider), (tokens, now), timeout=None)
+        return result
+    finally:
+        cache.delete(lock_key)
+
+
+def take_tokens(provider, wanted):
+    """
+    take up to wanted tokens from the bucket of a provider. Returns
+    (tokens taken, seconds until the next token when none could be taken).
+    """
+
+    def take(tokens, rate, burst):
+        taken = max(0, min(wanted, int(tokens)))
+        wait = 0 if taken else (1 - tokens) / rate
+        return tokens - taken, (taken, wait)
+
+    return update_bucket(provider, take) or (0, 0.05)
+
+
+def pause_provider(provider, seconds):
+    """empty the bucket of a provider so no mail goes out for seconds"""
+    update_bucket(provider, lambda tokens, rate, burst: (-seconds * rate, None))
+
+
+def retry_delay(attempts):
+    """exponential backoff with jitter, so failed mails do not retry in step"""
+    delay = min(
+        settings.EMAIL_OUTBOX_MAX_RETRY_DELAY_IN_SECS,
+        settings.EMAIL_OUTBOX_RETRY_DELAY_IN_SECS * 2 ** (attempts - 1),
+    )
+    return timedelta(seconds=delay * random.uniform(0.5, 1))
+
+
+def is_rejected_recipient(error):
+    """a permanent refusal of the recipient, not worth retrying"""
+    return isinstance(error, smtplib.SMTPRecipientsRefused) and all(
+        code >= 500 for code, _ in error.recipients.values()
+    )
+
+
+# template -> function(email) returning the context it is rendered with
+context_builders = {}
+
+
+def context_builder(template):
+    """register the function building the context of the mails of template"""
+
+    def register(build):
+        context_builders[template] = build
+        return build
+
+    return register
+
+
+def render_context(email):
+    build = context_builders.get(email.template)
+    return email.context if build is None else build(email)
+
+
+def enqueue_emails(template, subject, messages, provider=DEFAULT_PROVIDER):
+    """
+    queue a mail of template for every (voter, context) of messages,
+    skipping voters with one still pending. Returns the number queued.
+    """
+    voters = {voter.id: (voter, context) for voter, context in messages}
+    queued = set(
+        OutboxEmail.objects.filter(
+            voter_id__in=voters, template=template, status=EmailStatusChoices.PENDING
+        ).values_list("voter_id", flat=True)
+    )
+    emails = [
+        OutboxEmail(
+            voter=voter,
+            template=template,
+            subject=subject,
+            recipient=voter.email,
+            context=context,
+            provider=provider,
+        )
+        for id, (voter, context) in voters.items()
+        if id not in queued
+    ]
+    # a concurrent enqueue of the same mail is ignored by the unique constraint
+    # on pending mails
+    OutboxEmail.objects.bulk_create(emails, batch_size=1000, ignore_conflicts=True)
+    return len(emails)
+
+
+def due_emails(provider):
+    return OutboxEmail.objects.filter(
+        provider=provider,
+        status=EmailStatusChoices.PENDING,
+        next_attempt_at__lte=timezone.now(),
+    )
+
+
+def claim_due_emails(provider, limit):
+    """
+    lease up to limit due mails to this runner: they are not due again
+    until EMAIL_OUTBOX_LEASE_IN_SECS, in case the runner dies while sending
+    """
+    with transaction.atomic():
+        emails = list(
+            due_emails(provider)
+            .select_related("voter__election")
+            .select_for_update(skip_locked=True, of=("self",))
+            .order_by("next_attempt_at")[:limit]
+        )
+        OutboxEmail.objects.filter(id__in=[email.id for email in emails]).update(
+            next_attempt_at=timezone.now()
+            + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE_IN_SECS)
+        )
+    return emails
+
+
+def release_emails(emails):
+    OutboxEmail.objects.filter(id__in=[email.id for email in emails]).update(
+        next_attempt_at=timezone.now()
+    )
+
+
+def record_failure(email, error):
+    """schedule the retry of a failed mail, or give up on it"""
+    attempts = email.attempts + 1
+    if is_rejected_recipient(error) or attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        logger.warning(f"Giving up on {email.template} to {email.recipient}: {error}")
+        OutboxEmail.objects.filter(id=email.id).update(
+            status=EmailStatusChoices.FAILED,
+            attempts=attempts,
+            last_error=str(error),
+            context={},
+        )
+        return "failed"
+    OutboxEmail.objects.filter(id=email.id).update(
+        attempts=attempts,
+        last_error=str(error),
+        next_attempt_at=timezone.now() + retry_delay(attempts),
+    )
+    return "retried"
+
+
+def send_emails(connection, emails):
+    """
+    send mails over one connection. Returns (outcome counts, whether the
+    provider failed); the mails after a provider failure are left due.
+    """
+    results, sent, templates = Counter(), [], {}
+    provider_failed = False
+    for index, email in enumerate(emails):
+        if email.template not in templates:
+            templates[email.template] = get_template(email.template)
+        body = templates[email.template].render(render_context(email))
+        if email.recipient != email.voter.email:
+            # the email of the voter was corrected since the mail was queued
+            email.recipient = email.voter.email
+            OutboxEmail.objects.filter(id=email.id).update(recipient=email.recipient)
+        message = EmailMultiAlternatives(
+            email.subject,
+            body,
+            f"{settings.DEFAULT_FROM_EMAIL}",
+            [email.recipient],
+            connection=connection,
+        )
+        message.attach_alternative(body, "text/html")
+        try:
+            connection.open()
+            message.send()
+        except (smtplib.SMTPException, OSError) as error:
+            logger.exception(f"Could not send {email.template} to {email.recipient}")
+            results[record_failure(email, error)] += 1
+            connection.close()
+            if not is_rejected_recipient(error):
+                release_emails(emails[index + 1 :])
+                provider_failed = True
+                break
+        else:
+            sent.append(email.id)
+    OutboxEmail.objects.filter(id__in=sent).update(
+        status=EmailStatusChoices.SENT,
+        attempts=F("attempts") + 1,
+        sent_at=timezone.now(),
+        last_error="",
+        context={},
+    )
+    results["sent"] += len(sent)
+    return results, provider_failed
+
+
+def send_due_emails(provider=DEFAULT_PROVIDER, run_for=None):
+    """
+    send the due mails of a provider as fast as its bucket allows, for at
+    most run_for seconds. Returns (outcome counts, whether mails are left due).
+    """
+    limits = provider_settings(provider)
+    if run_for is None:
+        run_for = settings.EMAIL_OUTBOX_RUN_IN_SECS
+    deadline = time.monotonic() + run_for
+    connection = get_connection(**limits.get("connection", {}))
+    results = Counter()
+    try:
+        while time.monotonic() < deadline:
+            emails = claim_due_emails(provider, limits["burst"])
+            if not emails:
+                return results, False
+            while emails:
+                taken, wait = take_tokens(provider, len(emails))
+                if not taken:
+                    if time.monotonic() + wait > deadline:
+                        release_emails(emails)
+                        return results, True
+                    time.sleep(wait)
+                    continue
+                batch, emails = emails[:taken], emails[taken:]
+                outcome, provider_failed = send_emails(connection, batch)
+                results.update(outcome)
+                if provider_failed:
+                    release_emails(emails)
+                    pause_provider(
+                        provider, settings.EMAIL_OUTBOX_PROVIDER_PAUSE_IN_SECS
+                    )
+                    return results, True
+        return results, due_emails(provider).exists()
+    finally:
+        connection.close()
@@ -1,7 +1,11 @@
-from rest_framework.permissions import BasePermission, SAFE_METHODS
+from rest_framework.permissions import BasePermission
 from .models import Voter
 
 
 class IsVoter(BasePermission):
     def has_permission(self, request, view):
-        return isinstance(request.user, Voter)
+        if not isinstance(request.user, Voter):
+            return False
+        # a voter only acts on the election they were registered for
+        election_id = view.kwargs.get("election_id")
+        return election_id is None or str(request.user.election_id) == str(election_id)
@@ -1,20 +1,109 @@
 from rest_framework import serializers
-from .models import Voter
-from django.contrib.auth.hashers import check_password
+from .models import Voter, VoterImportJob
 import jwt
 from django.conf import settings
-from apps.election.models import Election, BallotQuestion, Option
+from apps.election.models import OptionTally, Vote
+from apps.election.results import tallies_changed
+from .authentication import voter_cache
+from .ballot import BallotPlan, parse_uuid
+from .login import VerificationPoolFull, verify_pass_key
+from .utils import generate_unique_pass_names
+from django.db.models import Q
 from django.utils import timezone
-from rest_framework.exceptions import NotFound
-from django.utils import timezone, timesince
+from rest_framework.exceptions import AuthenticationFailed, NotFound, Throttled
+from django.db import IntegrityError, transaction
 import datetime
 
 
+class VoterListSerializer(serializers.ListSerializer):
+    """
+    creates a batch of voters with one bulk_create: pass names are generated
+    up front and duplicate emails or phone numbers rejected before the insert.
+    expects the election in the context.
+    """
+
+    unique_fields = {"email": "email", "phone_number": "phone number"}
+
+    def validate(self, attrs):
+        errors = [{} for _ in attrs]
+        seen = {field: set() for field in self.unique_fields}
+        for error, item in zip(errors, attrs):
+            for field, label in self.unique_fields.items():
+                value = str(item[field])
+                if value in seen[field]:
+                    error[field] = [f"Duplicate {label} in this batch"]
+                seen[field].add(value)
+        existing = Voter.objects.filter(election=self.context["election"]).filter(
+            Q(email__in=seen["email"]) | Q(phone_number__in=seen["phone_number"])
+        )
+        taken = {field: set() for field in self.unique_fields}
+        for email, phone_number in existing.values_list("email", "phone_number"):
+            taken["email"].add(email)
+            taken["phone_number"].add(str(phone_number))
+        for error, item in zip(errors, attrs):
+            for field, label in self.unique_fields.items():
+                if str(item[field]) in taken[field]:
+                    error[field] = [
+                        f"A voter with this {label} already exists in this election"
+                    ]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return attrs
+
+    def create(self, validated_data):
+        pass_names = generate_unique_pass_names(Voter, len(validated_data))
+        return Voter.objects.bulk_create(
+            [
+                Voter(pass_name=pass_name, **item)
+                for pass_name, item in zip(pass_names, validated_data)
+            ],
+            batch_size=1000,
+        )
+
+
 class VoterSerializer(serializers.ModelSerializer):
     class Meta:
         model = Voter
         read_only_fields = ["election"]
         exclude = ["pass_name", "pass_key"]
+        list_serializer_class = VoterListSerializer
+
+
+class VoterImportJobSerializer(serializers.ModelSerializer):
+    rows_per_sec = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = VoterImportJob
+        fields = [
+            "id",
+            "election",
+            "file",
+            "status",
+            "rows_processed",
+            "rows_rejected",
+            "rows_per_sec",
+            "rejections",
+            "error",
+            "created_at",
+            "started_at",
+            "finished_at",
+        ]
+        read_only_fields = [
+            "election",
+            "status",
+            "rows_processed",
+            "rows_rejected",
+            "rejections",
+            "error",
+            "started_at",
+            "finished_at",
+        ]
+        extra_kwargs = {"file": {"write_only": True}}
+
+    def validate_file(self, file):
+        if not file.name.lower().endswith(".csv"):
+            raise serializers.ValidationError("Upload the voter roll as a .csv file")
+        return file
 
 
 class VoterLoginSerializer(serializers.ModelSerializer):
@@ -27,20 +116,36 @@ class VoterLoginSerializer(serializers.ModelSerializer):
         }
 
     def validate(self, attrs):
-        voter = self.Meta.model.objects.filter(pass_name=attrs.get("pass_name")).first()
+        voter = (
+            self.Meta.model.objects.filter(
+                election_id=self.context.get("election_id"),
+                pass_name=attrs.get("pass_name"),
+            )
+            .only("election_id", "pass_key", "is_verified")
+            .first()
+        )
         if voter is None:
             raise serializers.ValidationError("Voter does not exist.")
-        if not check_password(attrs.get("pass_key"), voter.pass_key):
+        try:
+            valid = verify_pass_key(attrs.get("pass_key"), voter.pass_key)
+        except VerificationPoolFull:
+            raise Throttled(
+                wait=1, detail="Too many voters are logging in, retry shortly"
+            )
+        if not valid:
             raise serializers.ValidationError("Invalid credentials")
         if not voter.is_verified:
             raise serializers.ValidationError("Voter's email is not verified")
+        attrs["voter"] = voter
         return super().validate(attrs)
 
     def save(self):
-        pass_name = self.validated_data["pass_name"]
+        voter = self.validated_data["voter"]
         token = jwt.encode(
             {
-                "pass_name": pass_name,
+                "voter_id": str(voter.id),
+                "election_id": str(voter.election_id),
+                "is_verified": voter.is_verified,
                 "exp": timezone.now()
                 + datetime.timedelta(seconds=settings.VOTER_JWT_EXPIRY_IN_SECS),
             },
@@ -54,33 +159,59 @@ class OptionSerializer(serializers.Serializer):
     option_id = serializers.CharField(write_only=True)
 
 
+class VoteListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        # load everything the items are validated against in one go
+        # instead of letting every item query on its own
+        self.ballot_plan = BallotPlan.load(
+            self.context.get("election_id"), self.context.get("request").user, data
+        )
+        return super().to_internal_value(data)
+
+    def create(self, validated_data):
+        return VoteSerializer.cast_ballot(
+            validated_data, self.context.get("election_id")
+        )
+
+
 class VoteSerializer(serializers.Serializer):
     ballot_question_id = serializers.CharField(write_only=True)
     choices = OptionSerializer(many=True)
 
+    class Meta:
+        list_serializer_class = VoteListSerializer
+
+    @property
+    def ballot_plan(self):
+        if isinstance(self.parent, VoteListSerializer):
+            return self.parent.ballot_plan
+        if not hasattr(self, "_ballot_plan"):
+            self._ballot_plan = BallotPlan.load(
+                self.context.get("election_id"),
+                self.context.get("request").user,
+                [self.initial_data],
+            )
+        return self._ballot_plan
+
     def validate_choices(self, value):
         """ensure that the Option object that corresponds
         to the option_id(s) in choices exist in the database"""
-        is_all_choices_valid = all(
-            [
-                Option.objects.filter(id=choice.get("option_id")).exists()
-                for choice in value
-            ]
-        )
-        if not is_all_choices_valid:
+        option_ids = [choice.get("option_id") for choice in value]
+        if not self.ballot_plan.options_exist(option_ids):
             raise serializers.ValidationError(
                 "Invalid choice. One or more of the choice does not exist"
             )
+        if len(set(option_ids)) != len(option_ids):
+            raise serializers.ValidationError(
+                "Invalid choice. A choice cannot be picked more than once"
+            )
         return value
 
     def validate(self, attrs):
-        # print(self.context)
-        # print(attrs.get("choices"))
         attrs = super().validate(attrs)
-        election = Election.objects.filter(id=self.context.get("election_id")).first()
-        ballot_question = BallotQuestion.objects.filter(
-            id=attrs.get("ballot_question_id"), election=election
-        ).first()
+        plan = self.ballot_plan
+        election = plan.election
+        ballot_question = plan.get_question(attrs.get("ballot_question_id"))
         if ballot_question is None:
             raise NotFound("Ballot Question does not exist.", 404)
         if election is None:
@@ -91,26 +222,58 @@ class VoteSerializer(serializers.Serializer):
             )
         if election.status != "LIVE":
             raise serializers.ValidationError("The election is not LIVE yet")
+        option_ids = [choice.get("option_id") for choice in attrs.get("choices")]
         if (
-            len(attrs.get("choices")) > ballot_question.validation_choice_max
-            or len(attrs.get("choices")) < ballot_question.validation_choice_min
+            len(option_ids) > ballot_question.validation_choice_max
+            or len(option_ids) < ballot_question.validation_choice_min
         ):
             raise serializers.ValidationError(
                 f"You cannot vote for more than {ballot_question.validation_choice_max} or less than {ballot_question.validation_choice_min}"
             )
-        voter = self.context.get("request").user
-        can_vote = Option.can_vote(voter, ballot_question)
-        if not can_vote:
+        if not plan.options_belong_to(ballot_question, option_ids):
+            raise serializers.ValidationError(
+                "Invalid choice. One or more of the choice does not belong to this ballot question"
+            )
+        if (
+            plan.has_voted_any(ballot_question, option_ids)
+            or plan.voted_count(ballot_question) + len(option_ids)
+            > ballot_question.validation_choice_max
+        ):
             raise serializers.ValidationError(f"Already voted")
+        plan.claim(ballot_question, option_ids)
         return attrs
 
     def create(self, validated_data):
-        voter = validated_data.pop("voter")
-        choices = validated_data.get("choices")
-        for choice in choices:
-            option_id = choice.get("option_id")
-            # since it been validated that Option object exist in the validation
-            option = Option.objects.get(id=option_id)
-            option.voters.add(voter)
-            option.save()
-        return {"choices": choices, **validated_data}
+        return self.cast_ballot([validated_data], self.context.get("election_id"))[0]
+
+    @staticmethod
+    def cast_ballot(ballot, election_id):
+        """write every choice of the ballot in one transaction
+        with a single insert into the Vote table"""
+        votes, voter_ids = {}, set()
+        for attrs in ballot:
+            voter = attrs.pop("voter")
+            voter_ids.add(voter.id)
+            for choice in attrs.get("choices"):
+                option_id = parse_uuid(choice.get("option_id"))
+                votes[option_id] = Vote(option_id=option_id, voter_id=voter.id)
+        try:
+            with transaction.atomic():
+                # the voter may come from the voter cache of a process that
+                # has not seen it deleted; the lock keeps it until commit
+                found = Voter.objects.select_for_update().filter(id__in=voter_ids)
+                if set(found.values_list("id", flat=True)) != voter_ids:
+                    for voter_id in voter_ids:
+                        voter_cache.invalidate(voter_id)
+                    raise AuthenticationFailed("Your token is invalid")
+                Vote.objects.bulk_create(votes.values())
+                OptionTally.objects.increment(votes.keys())
+                transaction.on_commit(
+                    lambda: tallies_changed(election_id, dict.fromkeys(votes, 1))
+                )
+        except IntegrityError:
+            # a concurrent duplicate submission got past validation and
+            # failed on the unique (option, voter) constraint, the tallies
+            # were rolled back with it
+            raise serializers.ValidationError("Already voted")
+        return ballot
@@ -1,16 +1,39 @@
 import logging
 from .models import Voter
-from django.db.models.signals import post_save
+from apps.election.models import OptionTally
+from apps.election.results import tallies_changed
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save, pre_delete
 from django.dispatch import receiver
 from . import utils
+from .authentication import voter_cache
 
 logger = logging.getLogger(__name__)
 
 
-@receiver(post_save, sender=Voter)
-def handle_voter_post_save(sender, instance, created, **kwargs):
-    if created:
-        # generate pass_name
+@receiver(pre_save, sender=Voter)
+def handle_voter_pre_save(sender, instance, **kwargs):
+    if instance._state.adding and not instance.pass_name:
+        # generate pass_name, voters created in bulk come with theirs
         logger.info(f"generating pass_name for {instance.email}")
         instance.pass_name = utils.generate_unique_pass_name(instance)
-        instance.save()
+
+
+@receiver(post_save, sender=Voter)
+@receiver(post_delete, sender=Voter)
+def handle_voter_changed(sender, instance, **kwargs):
+    # authenticated requests must not go on with the old voter
+    voter_cache.invalidate(instance.id)
+
+
+@receiver(pre_delete, sender=Voter)
+def handle_voter_pre_delete(sender, instance, **kwargs):
+    # the voter's votes are removed with it, take them off the tallies
+    option_ids = list(instance.voted_options.values_list("id", flat=True))
+    OptionTally.objects.increment(option_ids, amount=-1)
+    if option_ids:
+        transaction.on_commit(
+            lambda: tallies_changed(
+                instance.election_id, dict.fromkeys(option_ids, -1)
+            )
+        )
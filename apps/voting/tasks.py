@@ -0,0 +1,136 @@
+import logging
+from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.encoding import smart_bytes
+from django.utils.http import urlsafe_base64_encode
+from apps.election.models import Election
+from .credentials import issue_credentials
+from .imports import run_import
+from .models import ImportStatusChoices, Voter, VoterImportJob
+from .outbox import (
+    DEFAULT_PROVIDER,
+    context_builder,
+    due_emails,
+    enqueue_emails,
+    send_due_emails,
+)
+from .tokens import VoterTokenGenerator
+
+logger = logging.getLogger(__name__)
+
+VERIFICATION_TEMPLATE = "voting/verify_voter.html"
+VERIFICATION_SUBJECT = "Votex - Complete Voter's Registration"
+
+
+def verification_link(site_url, voter):
+    uidb64 = urlsafe_base64_encode(smart_bytes(voter.id))
+    token = VoterTokenGenerator().make_token(voter)
+    path = reverse("apps.voting:verify_voter", args=(uidb64,))
+    return f"{site_url.rstrip('/')}{path}?token={token}"
+
+
+@context_builder(VERIFICATION_TEMPLATE)
+def verification_context(email):
+    # the link is made when the mail goes out, for the voter's current email
+    return {
+        "election_title": email.voter.election.title,
+        "link": verification_link(email.context["site_url"], email.voter),
+    }
+
+
+def queue_emails(template, subject, messages, provider=DEFAULT_PROVIDER):
+    """add (voter, context) messages to the outbox and wake its sender"""
+    queued = enqueue_emails(template, subject, messages, provider)
+    if queued:
+        transaction.on_commit(lambda: send_outbox_task.delay(provider))
+    return queued
+
+
+def dispatch_verification_emails(voter_ids, site_url):
+    """queue the verification mails of voters in the outbox"""
+    voter_ids = [str(id) for id in voter_ids]
+    size = settings.VERIFICATION_EMAIL_CHUNK_SIZE
+    for start in range(0, len(voter_ids), size):
+        voters = Voter.objects.filter(id__in=voter_ids[start : start + size])
+        messages = [(voter, {"site_url": site_url}) for voter in voters]
+        queue_emails(VERIFICATION_TEMPLATE, VERIFICATION_SUBJECT, messages)
+
+
+def schedule_credential_issuance(election_id):
+    """
+    issue the credentials of the voters of an election verifying within
+    CREDENTIAL_ISSUANCE_DELAY_IN_SECS of each other in one job
+    """
+    delay = settings.CREDENTIAL_ISSUANCE_DELAY_IN_SECS
+    if cache.add(f"credential-issuance:{election_id}", 1, timeout=delay):
+        election_id = str(election_id)
+        transaction.on_commit(
+            lambda: issue_credentials_task.apply_async((election_id,), countdown=delay)
+        )
+
+
+@shared_task
+def send_outbox_task(provider=DEFAULT_PROVIDER):
+    """send the due outbox mails of a provider, one runner at a time"""
+    lock_key = f"email-outbox-runner:{provider}"
+    if not cache.add(lock_key, 1, timeout=settings.EMAIL_OUTBOX_RUN_IN_SECS * 2):
+        # the running sender picks up the new mails
+        return None
+    try:
+        results, pending = send_due_emails(provider)
+    finally:
+        cache.delete(lock_key)
+    logger.info(f"Outbox {provider}: {dict(results)}")
+    if pending or due_emails(provider).exists():
+        send_outbox_task.apply_async((provider,), countdown=1)
+    return dict(results)
+
+
+@shared_task
+def drain_outbox_task():
+    """wake the sender of every provider with due mails, retries included"""
+    for provider in settings.EMAIL_OUTBOX_PROVIDERS:
+        if due_emails(provider).exists():
+            send_outbox_task.delay(provider)
+
+
+@shared_task
+def import_voters_task(job_id, site_url):
+    claimed = VoterImportJob.objects.filter(
+        id=job_id, status=ImportStatusChoices.PENDING
+    ).update(status=ImportStatusChoices.RUNNING, started_at=timezone.now())
+    if not claimed:
+        # deleted, or picked up by another worker already
+        return None
+    job = VoterImportJob.objects.get(id=job_id)
+    logger.info(f"Importing voters of {job.election_id} from {job.file.name}")
+    run_import(
+        job, on_created=lambda ids: dispatch_verification_emails(ids, site_url)
+    )
+    return job_id
+
+
+@shared_task
+def issue_credentials_task(election_id):
+    election = Election.objects.filter(id=election_id).only("id", "title").first()
+    if election is None:
+        return 0
+    return issue_credentials(
+        election, on_issued=lambda count: send_outbox_task.delay(DEFAULT_PROVIDER)
+    )
+
+
+@shared_task
+def issue_pending_credentials_task():
+    """issue the credentials of voters whose issuance job was lost"""
+    elections = (
+        Voter.objects.filter(is_verified=True, pass_key="")
+        .values_list("election_id", flat=True)
+        .distinct()
+    )
+    for election_id in elections:
+        schedule_credential_issuance(election_id)
@@ -1,3 +1,486 @@
-from django.test import TestCase
+import datetime
+import shutil
+import tempfile
+import uuid
 
-# Create your tests here.
+from django.core import mail
+from django.core.cache import cache
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db.models import Sum
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+import jwt
+
+from apps.accounts.models import CustomUser
+from apps.election.models import BallotQuestion, Election, Option, OptionTally, Vote
+from .imports import run_import
+from .credentials import (
+    CREDENTIALS_SUBJECT,
+    CREDENTIALS_TEMPLATE,
+    issue_chunk,
+    issue_credentials,
+)
+from .authentication import voter_cache
+from .login import VerificationPool, VerificationPoolFull
+from .models import (
+    EmailStatusChoices,
+    ImportStatusChoices,
+    OutboxEmail,
+    Voter,
+    VoterImportJob,
+)
+from .outbox import enqueue_emails, send_due_emails
+from .serializers import VoteSerializer
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT,
+    VOTER_IMPORT_CHUNK_SIZE=2,
+    PHONENUMBER_DEFAULT_REGION="NG",
+)
+class ImportTest(TestCase):
+    """
+    CSV voter rolls upserted chunk by chunk, through COPY and a staging
+    table on PostgreSQL
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        # every election is created with the default settings
+        call_command("create_default_category")
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(
+            email="organizer@example.com", password="password", username="organizer"
+        )
+        now = timezone.now()
+        self.election = Election.objects.create(
+            title="Import",
+            start_date=now,
+            end_date=now + datetime.timedelta(days=1),
+            timezone="Africa/Lagos",
+            created_by=self.user,
+        )
+
+    def run_roll(self, rows):
+        content = "email,phone_number\n" + "\n".join(rows) + "\n"
+        job = VoterImportJob.objects.create(
+            election=self.election,
+            created_by=self.user,
+            file=SimpleUploadedFile("roll.csv", content.encode()),
+            status=ImportStatusChoices.RUNNING,
+            started_at=timezone.now(),
+        )
+        created = []
+        run_import(job, on_created=created.extend)
+        job.refresh_from_db()
+        return job, created
+
+    def test_import_creates_voters(self):
+        job, created = self.run_roll(
+            [
+                "a@example.com,08031000001",
+                "b@example.com,08031000002",
+                "c@example.com,08031000003",
+            ]
+        )
+        self.assertEqual(job.status, ImportStatusChoices.COMPLETED)
+        self.assertEqual((job.rows_processed, job.rows_rejected), (3, 0))
+        voters = Voter.objects.filter(election=self.election)
+        self.assertEqual(len(created), 3)
+        self.assertEqual(voters.count(), 3)
+        for voter in voters:
+            self.assertTrue(voter.pass_name)
+            self.assertEqual(voter.pass_key, "")
+            self.assertFalse(voter.is_verified)
+
+    def test_reimport_updates_phone_numbers(self):
+        self.run_roll(["a@example.com,08031000001", "b@example.com,08031000002"])
+        job, created = self.run_roll(
+            ["a@example.com,08031000009", "d@example.com,08031000004"]
+        )
+        self.assertEqual(job.status, ImportStatusChoices.COMPLETED)
+        self.assertEqual(job.rows_rejected, 0)
+        self.assertEqual(len(created), 1)
+        voter = Voter.objects.get(election=self.election, email="a@example.com")
+        self.assertEqual(str(voter.phone_number), "+2348031000009")
+        self.assertEqual(Voter.objects.filter(election=self.election).count(), 3)
+
+
+@override_settings(VOTER_JWT_SECRET_KEY="voter-secret")
+class BallotTestCase(TestCase):
+    """a LIVE election with two questions of three options and two voters"""
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("create_default_category")
+        cls.user = CustomUser.objects.create_user(
+            email="organizer@example.com", password="password", username="organizer"
+        )
+        now = timezone.now()
+        cls.election = Election.objects.create(
+            title="Ballot",
+            start_date=now - datetime.timedelta(hours=1),
+            end_date=now + datetime.timedelta(hours=1),
+            timezone="Africa/Lagos",
+            created_by=cls.user,
+            status="LIVE",
+            live_code="LIVECODE",
+        )
+        cls.questions = [
+            BallotQuestion.objects.create(
+                election=cls.election,
+                title=f"Question {i}",
+                short_description="short",
+                description="description",
+                validation_choice_max=2,
+            )
+            for i in range(2)
+        ]
+        cls.options = {
+            question.id: [
+                Option.objects.create(
+                    ballot_question=question,
+                    title=f"Option {i}",
+                    short_description="short",
+                    description="description",
+                )
+                for i in range(3)
+            ]
+            for question in cls.questions
+        }
+        cls.voter, cls.other_voter = [
+            Voter.objects.create(
+                election=cls.election,
+                email=f"voter{i}@example.com",
+                phone_number=f"+23480310000{i:02d}",
+                is_verified=True,
+            )
+            for i in range(2)
+        ]
+
+    def voter_client(self, voter):
+        client = APIClient()
+        token = jwt.encode(
+            {
+                "voter_id": str(voter.id),
+                "election_id": str(voter.election_id),
+                "is_verified": voter.is_verified,
+                "exp": timezone.now() + datetime.timedelta(hours=1),
+            },
+            "voter-secret",
+            algorithm="HS256",
+        )
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {token}")
+        return client
+
+    def vote(self, voter, ballot):
+        return self.voter_client(voter).post(
+            f"/elections/{self.election.id}/votes", ballot, format="json"
+        )
+
+    def choice(self, question, *picks):
+        options = self.options[question.id]
+        return {
+            "ballot_question_id": str(question.id),
+            "choices": [{"option_id": str(options[pick].id)} for pick in picks],
+        }
+
+    def tally(self, option):
+        return option.tallies.aggregate(count=Sum("count"))["count"] or 0
+
+
+class VoteTest(BallotTestCase):
+    def test_ballot_is_counted(self):
+        response = self.vote(
+            self.voter,
+            [self.choice(self.questions[0], 0, 1), self.choice(self.questions[1], 2)],
+        )
+        self.assertEqual(response.status_code, 200)
+        options = self.options[self.questions[0].id]
+        self.assertEqual([self.tally(option) for option in options], [1, 1, 0])
+        self.assertEqual(Vote.objects.filter(voter=self.voter).count(), 3)
+
+    def test_duplicate_ballot_is_rejected(self):
+        ballot = [self.choice(self.questions[0], 0)]
+        self.assertEqual(self.vote(self.voter, ballot).status_code, 200)
+        response = self.vote(self.voter, ballot)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.tally(self.options[self.questions[0].id][0]), 1)
+
+    def test_racing_duplicate_ballot_is_rejected(self):
+        # the second ballot passed validation before the first was committed
+        option = self.options[self.questions[0].id][0]
+        ballot = [{"voter": self.voter, "choices": [{"option_id": str(option.id)}]}]
+        VoteSerializer.cast_ballot([dict(item) for item in ballot], self.election.id)
+        with self.assertRaisesMessage(serializers.ValidationError, "Already voted"):
+            VoteSerializer.cast_ballot(
+                [dict(item) for item in ballot], self.election.id
+            )
+        self.assertEqual(self.tally(option), 1)
+        self.assertEqual(Vote.objects.filter(voter=self.voter).count(), 1)
+
+    def test_ballot_of_deleted_voter_is_refused(self):
+        # another process still has the voter in its voter cache
+        voter = Voter.objects.get(id=self.voter.id)
+        Voter.objects.filter(id=voter.id).delete()
+        option = self.options[self.questions[0].id][0]
+        ballot = [{"voter": voter, "choices": [{"option_id": str(option.id)}]}]
+        with self.assertRaises(AuthenticationFailed):
+            VoteSerializer.cast_ballot(ballot, self.election.id)
+        self.assertEqual(self.tally(option), 0)
+
+
+class OutboxTest(BallotTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def queue_credentials(self, pass_key):
+        return enqueue_emails(
+            CREDENTIALS_TEMPLATE,
+            CREDENTIALS_SUBJECT,
+            [(self.voter, {"pass_key": pass_key})],
+        )
+
+    def test_mail_is_rendered_from_the_voter_when_sent(self):
+        self.queue_credentials("first-key")
+        Voter.objects.filter(id=self.voter.id).update(email="corrected@example.com")
+        results, pending = send_due_emails(run_for=1)
+        self.assertEqual((results["sent"], pending), (1, False))
+        self.assertEqual(mail.outbox[0].to, ["corrected@example.com"])
+        self.assertIn("first-key", mail.outbox[0].body)
+        self.assertIn(self.election.title, mail.outbox[0].body)
+        email = OutboxEmail.objects.get(voter=self.voter)
+        self.assertEqual(email.status, EmailStatusChoices.SENT)
+        self.assertEqual(email.context, {})
+
+    def test_only_one_mail_pending_per_voter_and_template(self):
+        self.assertEqual(self.queue_credentials("first-key"), 1)
+        self.assertEqual(self.queue_credentials("second-key"), 0)
+        send_due_emails(run_for=1)
+        # once sent, the voter can be mailed again
+        self.assertEqual(self.queue_credentials("second-key"), 1)
+        send_due_emails(run_for=1)
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertIn("second-key", mail.outbox[1].body)
+
+
+class CredentialsTest(BallotTestCase):
+    def test_verified_voters_are_issued_once(self):
+        self.assertEqual(issue_credentials(self.election), 2)
+        self.assertEqual(issue_credentials(self.election), 0)
+        for voter in Voter.objects.filter(election=self.election):
+            self.assertTrue(voter.pass_key)
+        self.assertEqual(
+            OutboxEmail.objects.filter(template=CREDENTIALS_TEMPLATE).count(), 2
+        )
+
+    def test_voter_issued_while_hashing_keeps_its_pass_key(self):
+        test = self
+
+        class ConcurrentPool:
+            def map(self, function, items):
+                # another job issues one of the voters meanwhile
+                Voter.objects.filter(id=test.voter.id).update(pass_key="issued")
+                return map(function, items)
+
+        self.assertEqual(issue_chunk(ConcurrentPool(), self.election, 10), (2, 1))
+        self.assertEqual(Voter.objects.get(id=self.voter.id).pass_key, "issued")
+        self.assertEqual(
+            list(OutboxEmail.objects.values_list("voter_id", flat=True)),
+            [self.other_voter.id],
+        )
+
+
+class BallotValidationTest(BallotTestCase):
+    def assertRejected(self, ballot, status_code=400):
+        response = self.vote(self.voter, ballot)
+        self.assertEqual(response.status_code, status_code, response.content)
+        self.assertFalse(Vote.objects.exists())
+        self.assertFalse(OptionTally.objects.filter(count__gt=0).exists())
+
+    def test_more_choices_than_allowed(self):
+        self.assertRejected([self.choice(self.questions[0], 0, 1, 2)])
+
+    def test_fewer_choices_than_required(self):
+        self.assertRejected([self.choice(self.questions[0])])
+
+    def test_same_option_twice(self):
+        self.assertRejected([self.choice(self.questions[0], 0, 0)])
+
+    def test_option_of_another_question(self):
+        ballot = self.choice(self.questions[0], 0)
+        ballot["choices"] = self.choice(self.questions[1], 0)["choices"]
+        self.assertRejected([ballot])
+
+    def test_unknown_option(self):
+        ballot = self.choice(self.questions[0])
+        ballot["choices"] = [{"option_id": str(uuid.uuid4())}]
+        self.assertRejected([ballot])
+
+    def test_unknown_question(self):
+        ballot = self.choice(self.questions[0], 0)
+        ballot["ballot_question_id"] = str(uuid.uuid4())
+        self.assertRejected([ballot], 404)
+
+    def test_ended_election(self):
+        Election.objects.filter(id=self.election.id).update(
+            end_date=timezone.now() - datetime.timedelta(minutes=1)
+        )
+        self.assertRejected([self.choice(self.questions[0], 0)])
+
+    def test_one_invalid_question_rejects_the_whole_ballot(self):
+        self.assertRejected(
+            [self.choice(self.questions[0], 0), self.choice(self.questions[1], 0, 0)]
+        )
+
+    def test_votes_add_up_to_the_maximum(self):
+        self.assertEqual(
+            self.vote(self.voter, [self.choice(self.questions[0], 0)]).status_code,
+            200,
+        )
+        response = self.vote(self.voter, [self.choice(self.questions[0], 1, 2)])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Vote.objects.filter(voter=self.voter).count(), 1)
+
+    def test_voter_of_another_election(self):
+        response = self.voter_client(self.voter).post(
+            f"/elections/{uuid.uuid4()}/votes",
+            [self.choice(self.questions[0], 0)],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 403)
+
+
+class TallyTest(BallotTestCase):
+    def test_deleting_a_voter_takes_its_votes_off_the_tallies(self):
+        options = self.options[self.questions[0].id]
+        self.vote(self.voter, [self.choice(self.questions[0], 0, 1)])
+        self.vote(self.other_voter, [self.choice(self.questions[0], 0)])
+        self.assertEqual([self.tally(option) for option in options], [2, 1, 0])
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.delete(f"/elections/voters/{self.voter.id}")
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual([self.tally(option) for option in options], [1, 0, 0])
+        self.assertEqual(Vote.objects.count(), 1)
+
+
+class VoterAuthenticationTest(BallotTestCase):
+    def setUp(self):
+        voter_cache.clear()
+
+    def test_saving_a_voter_evicts_it_from_the_cache(self):
+        self.vote(self.voter, [self.choice(self.questions[0], 0)])
+        self.assertIsNotNone(voter_cache.get(self.voter.id))
+        Voter.objects.get(id=self.voter.id).save()
+        self.assertIsNone(voter_cache.get(self.voter.id))
+
+    def test_deleting_a_voter_evicts_it_from_the_cache(self):
+        self.vote(self.voter, [self.choice(self.questions[0], 0)])
+        Voter.objects.get(id=self.voter.id).delete()
+        self.assertIsNone(voter_cache.get(self.voter.id))
+        response = self.vote(self.voter, [self.choice(self.questions[1], 0)])
+        self.assertEqual(response.status_code, 401)
+
+    def test_token_of_an_unverified_voter(self):
+        self.voter.is_verified = False
+        response = self.vote(self.voter, [self.choice(self.questions[0], 0)])
+        self.assertEqual(response.status_code, 401)
+
+    def test_cached_voter_of_another_election(self):
+        self.vote(self.voter, [self.choice(self.questions[0], 0)])
+        self.voter.election_id = uuid.uuid4()
+        response = self.vote(self.voter, [self.choice(self.questions[1], 0)])
+        self.assertEqual(response.status_code, 401)
+
+
+class LoginTest(BallotTestCase):
+    def setUp(self):
+        Voter.objects.filter(id=self.voter.id).update(
+            pass_key=make_password("pass-key")
+        )
+        self.voter.refresh_from_db()
+
+    def login(self, election_id, pass_key="pass-key"):
+        return APIClient().post(
+            f"/elections/{election_id}/voters/login",
+            {"pass_name": self.voter.pass_name, "pass_key": pass_key},
+            format="json",
+        )
+
+    def test_login(self):
+        response = self.login(self.election.id)
+        self.assertEqual(response.status_code, 200)
+        token = response.json()["data"]["access_token"]
+        claims = jwt.decode(token, "voter-secret", algorithms=["HS256"])
+        self.assertEqual(claims["voter_id"], str(self.voter.id))
+        self.assertEqual(claims["election_id"], str(self.election.id))
+
+    def test_login_is_scoped_to_the_election(self):
+        self.assertEqual(self.login(uuid.uuid4()).status_code, 400)
+
+    def test_wrong_pass_key(self):
+        self.assertEqual(self.login(self.election.id, "wrong").status_code, 400)
+
+    def test_full_pool_turns_logins_away(self):
+        pool = VerificationPool(1, 0)
+        self.assertTrue(pool.check_password("pass-key", self.voter.pass_key))
+        pool.slots.acquire()
+        with self.assertRaises(VerificationPoolFull):
+            pool.check_password("pass-key", self.voter.pass_key)
+        self.assertEqual(pool.metrics()["rejected"], 1)
+
+
+class VoterListTest(BallotTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_batch_is_created_at_once(self):
+        response = self.client.post(
+            f"/elections/{self.election.id}/bulk-voters",
+            [
+                {"email": "new0@example.com", "phone_number": "+2348031000100"},
+                {"email": "new1@example.com", "phone_number": "+2348031000101"},
+            ],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+        voters = Voter.objects.filter(email__startswith="new")
+        self.assertEqual(voters.count(), 2)
+        self.assertTrue(all(voter.pass_name for voter in voters))
+
+    def test_batch_with_duplicates_is_rejected(self):
+        response = self.client.post(
+            f"/elections/{self.election.id}/bulk-voters",
+            [
+                {"email": "new0@example.com", "phone_number": "+2348031000100"},
+                {"email": "new0@example.com", "phone_number": "+2348031000101"},
+                {"email": self.voter.email, "phone_number": "+2348031000102"},
+            ],
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Voter.objects.filter(email__startswith="new").exists())
+
+    def test_voters_are_paged_in_creation_order(self):
+        url = f"/elections/{self.election.id}/voters?page_size=1"
+        emails = []
+        while url:
+            body = self.client.get(url).json()
+            emails += [voter["email"] for voter in body["data"]]
+            url = body["pagination"]["next"]
+        self.assertEqual(emails, [self.voter.email, self.other_voter.email])
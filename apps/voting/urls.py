@@ -3,6 +3,8 @@ from .views import (
     VoterListCreateView,
     VoterRetrieveUpdateDeleteView,
     VoterBatchCreateView,
+    VoterImportView,
+    VoterImportJobView,
     VoterVerificationView,
     VoterLoginView,
     VotingView,
@@ -30,6 +32,16 @@ urlpatterns = [
         VoterBatchCreateView,
         name="list_create_ballot_question",
     ),
+    path(
+        "<uuid:election_id>/voters/imports",
+        VoterImportView,
+        name="voter_import",
+    ),
+    path(
+        "<uuid:election_id>/voters/imports/<uuid:job_id>",
+        VoterImportJobView,
+        name="voter_import_job",
+    ),
     path(
         "voters/<uuid:voter_id>",
         VoterRetrieveUpdateDeleteView,
@@ -17,14 +17,24 @@ def generate_password(length=8):
     return password
 
 
-def generate_unique_pass_name(instance, new_pass_name=None):
-    if new_pass_name is not None:
-        pass_name = new_pass_name
-    else:
-        pass_name = get_random_string(8)
-    Klass = instance.__class__
-    qs_exists = Klass.objects.filter(pass_name=pass_name).exists()
-    if qs_exists:
-        new_pass_name = f"{pass_name}{secrets.token_hex(2)}"
-        return generate_unique_pass_name(instance, new_pass_name=new_pass_name)
-    return pass_name
+def generate_unique_pass_names(model, count):
+    """
+    count pass names unused by model, checked with one IN query per round;
+    a round only repeats for the few names that collided
+    """
+    pass_names = set()
+    while len(pass_names) < count:
+        candidates = {
+            get_random_string(8) for _ in range(count - len(pass_names))
+        } - pass_names
+        taken = set(
+            model.objects.filter(pass_name__in=candidates).values_list(
+                "pass_name", flat=True
+            )
+        )
+        pass_names |= candidates - taken
+    return list(pass_names)
+
+
+def generate_unique_pass_name(instance):
+    return generate_unique_pass_names(instance.__class__, 1)[0]
@@ -1,34 +1,42 @@
-from rest_framework.views import APIView
 from rest_framework import generics
-from .serializers import VoterSerializer, VoterLoginSerializer, VoteSerializer
-from .models import Voter
-from apps.election.models import Election
+from .serializers import (
+    VoterSerializer,
+    VoterLoginSerializer,
+    VoteSerializer,
+    VoterImportJobSerializer,
+)
+from .models import Voter, VoterImportJob
+from .tasks import (
+    dispatch_verification_emails,
+    import_voters_task,
+    schedule_credential_issuance,
+)
+from apps.election.mixins import ElectionLookupMixin
 from rest_framework.response import Response
 from rest_framework import status
 from .permissions import IsVoter
-from apps.common.permissions import IsOwnerOrReadOnly
-from django.shortcuts import get_object_or_404
-from apps.common.tasks import send_email_task
-from . import utils
-from django.contrib.auth.hashers import make_password
+from apps.common.pagination import EnvelopeCursorPagination
+from apps.common.renderers import envelope
+from apps.common.permissions import IsOwnerOrReadOnly, IsOwner
+from django.db import transaction
 import logging
 
 from .tokens import VoterTokenGenerator
-from django.urls import reverse_lazy
-from django.utils.encoding import smart_bytes, smart_str
-from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+from django.utils.encoding import smart_str
+from django.utils.http import urlsafe_base64_decode
 from rest_framework.exceptions import AuthenticationFailed, NotFound
 from .authentication import VoterJWTAuthentication
 
 logger = logging.getLogger(__name__)
 
 
-class VoterListCreateView(generics.ListCreateAPIView):
+class VoterListCreateView(ElectionLookupMixin, generics.ListCreateAPIView):
     """
     views to create and return list of voters
     for an election
     """
 
+    pagination_class = EnvelopeCursorPagination
     serializer_class = VoterSerializer
     permission_classes = [IsOwnerOrReadOnly]
 
@@ -36,78 +44,92 @@ class VoterListCreateView(generics.ListCreateAPIView):
         return Voter.objects.filter(election__id=self.kwargs.get("election_id"))
 
     def perform_create(self, serializer):
-        election = get_object_or_404(Election, id=self.kwargs.get("election_id"))
-        self.check_object_permissions(self.request, election)
-        data = serializer.save(election=election)
-        uidb64 = urlsafe_base64_encode(smart_bytes(data.id))
-        logger.info(f"The uidb64 is {uidb64}")
-        token = VoterTokenGenerator().make_token(data)
-        verify_link = self.request.build_absolute_uri(
-            reverse_lazy("apps.voting:verify_voter", args=(uidb64,))
+        voter = serializer.save(election=self.get_election())
+        logger.info(f"Sending verification mail to voter with email: {voter.email}")
+        site_url = self.request.build_absolute_uri("/")
+        transaction.on_commit(
+            lambda: dispatch_verification_emails([voter.id], site_url)
         )
-        verify_link += f"?token={token}"
-        logger.info(f"Sending verification mail to voter with email: {data.email}")
-        send_email_task.delay(
-            "voting/verify_voter.html",
-            {"election_title": election.title, "link": verify_link},
-            data.email,
-        )
-        logger.info(f"The verification is {verify_link}")
 
     def list(self, request, *args, **kwargs):
         data = super().list(request, *args, **kwargs).data
-        data = {
-            "status": "success",
-            "message": "All Voters fpr this election fetched fetched successfully",
-            "data": data,
-        }
+        data = envelope(
+            message="All Voters fpr this election fetched fetched successfully", **data
+        )
         return Response(data, status=status.HTTP_200_OK)
 
     def create(self, request, *args, **kwargs):
         data = super().create(request, *args, **kwargs).data
-        data = {
-            "status": "success",
-            "message": f"Voter created successfully",
-            "data": data,
-        }
+        data = envelope(data, f"Voter created successfully")
         return Response(data, status=status.HTTP_200_OK)
 
 
-class VoterBatchCreateView(generics.GenericAPIView):
+class VoterBatchCreateView(ElectionLookupMixin, generics.GenericAPIView):
     serializer_class = VoterSerializer
     permission_classes = [IsOwnerOrReadOnly]
 
     def post(self, request, election_id):
-        election = get_object_or_404(Election, id=election_id)
-        self.check_object_permissions(request, election)
-        serializer = self.serializer_class(data=request.data, many=True)
+        election = self.get_election()
+        serializer = self.get_serializer(
+            data=request.data,
+            many=True,
+            context={**self.get_serializer_context(), "election": election},
+        )
         serializer.is_valid(raise_exception=True)
-        serializer.save(election=election)
-        data = serializer.data
-        for voter in data:
-            voter = Voter.objects.get(id=voter.get("id"))
-            uidb64 = urlsafe_base64_encode(smart_bytes(voter.id))
-            logger.info(f"The uidb64 is {uidb64}")
-            token = VoterTokenGenerator().make_token(voter)
-            verify_link = self.request.build_absolute_uri(
-                reverse_lazy("apps.voting:verify_voter", args=(uidb64,))
-            )
-            verify_link += f"?token={token}"
-            logger.info(f"Sending verification mail to voter with email: {voter.email}")
-            send_email_task.delay(
-                "voting/verify_voter.html",
-                {"election_title": election.title, "link": verify_link},
-                voter.email,
-            )
-            logger.info(f"The verification is {verify_link}")
-        data = {
-            "status": "success",
-            "message": f"{len(data)} voters created successfully",
-            "data": data,
-        }
+        voters = serializer.save(election=election)
+        logger.info(f"Sending verification mails to {len(voters)} voters")
+        voter_ids = [voter.id for voter in voters]
+        site_url = request.build_absolute_uri("/")
+        transaction.on_commit(
+            lambda: dispatch_verification_emails(voter_ids, site_url)
+        )
+        # a summary, echoing thousands of rows back is of no use to the client
+        data = envelope(
+            {"election": election.id, "created": len(voters)},
+            f"{len(voters)} voters created successfully",
+        )
         return Response(data, status=status.HTTP_201_CREATED)
 
 
+class VoterImportView(ElectionLookupMixin, generics.CreateAPIView):
+    """
+    view to upload a CSV voter roll (email and phone_number columns),
+    imported in the background
+    """
+
+    serializer_class = VoterImportJobSerializer
+    permission_classes = [IsOwner]
+
+    def create(self, request, election_id):
+        election = self.get_election()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = serializer.save(election=election, created_by=request.user)
+        job_id, site_url = str(job.id), request.build_absolute_uri("/")
+        transaction.on_commit(lambda: import_voters_task.delay(job_id, site_url))
+        data = envelope(serializer.data, f"Voter import for {election.title} queued")
+        return Response(data, status=status.HTTP_202_ACCEPTED)
+
+
+class VoterImportJobView(generics.RetrieveAPIView):
+    """progress of a voter roll import"""
+
+    serializer_class = VoterImportJobSerializer
+    permission_classes = [IsOwner]
+    lookup_field = "id"
+    lookup_url_kwarg = "job_id"
+
+    def get_queryset(self):
+        return VoterImportJob.objects.filter(
+            election_id=self.kwargs.get("election_id")
+        ).select_related("election")
+
+    def retrieve(self, request, *args, **kwargs):
+        data = super().retrieve(request, *args, **kwargs).data
+        data = envelope(data, f"Voter import - {data.get('status')}")
+        return Response(data, status=status.HTTP_200_OK)
+
+
 class VoterRetrieveUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
     """
     views to retrieve, update and delete voters
@@ -120,33 +142,32 @@ class VoterRetrieveUpdateDeleteView(generics.RetrieveUpdateDestroyAPIView):
     lookup_url_kwarg = "voter_id"
 
     def get_queryset(self):
-        return Voter.objects.all()
+        # the election is needed for the ownership check
+        return Voter.objects.select_related("election")
 
     def retrieve(self, request, *args, **kwargs):
         data = super().retrieve(request, *args, **kwargs).data
-        data = {
-            "status": "success",
-            "message": f"Voter - {data.get('id')} retrieved successfully",
-            "data": data,
-        }
+        data = envelope(data, f"Voter - {data.get('id')} retrieved successfully")
         return Response(data, status=status.HTTP_200_OK)
 
+    def perform_update(self, serializer):
+        email = serializer.instance.email
+        voter = serializer.save()
+        if voter.email != email and not voter.is_verified:
+            # the verification link already sent was made for the old email
+            site_url = self.request.build_absolute_uri("/")
+            transaction.on_commit(
+                lambda: dispatch_verification_emails([voter.id], site_url)
+            )
+
     def update(self, request, *args, **kwargs):
         data = super().update(request, *args, **kwargs).data
-        data = {
-            "status": "success",
-            "message": f"Voter - {data.get('id')} updated successfully",
-            "data": data,
-        }
+        data = envelope(data, f"Voter - {data.get('id')} updated successfully")
         return Response(data, status=status.HTTP_200_OK)
 
     def destroy(self, request, *args, **kwargs):
         data = super().destroy(request, *args, **kwargs).data
-        data = {
-            "status": "success",
-            "message": f"Voter deleted successfully",
-            "data": data,
-        }
+        data = envelope(data, f"Voter deleted successfully")
         return Response(data, status=status.HTTP_204_NO_CONTENT)
 
 
@@ -166,25 +187,16 @@ class VoterVerificationView(generics.GenericAPIView):
             raise NotFound("Voter does not exist")
         if not VoterTokenGenerator().check_token(voter, token):
             raise AuthenticationFailed("This token is invalid")
-        voter.is_verified = True
-        raw_password = utils.generate_password()
-        print(f"{raw_password=}")
-        voter.pass_key = make_password(raw_password)
-        voter.save()
-        send_email_task.delay(
-            "voting/voter_cred.html",
-            {
-                "election_title": voter.election.title,
-                "pass_name": voter.pass_name,
-                "pass_key": raw_password,
-            },
-            voter.email,
+        # the pass key is issued with those of the other voters verifying now
+        verified = Voter.objects.filter(id=voter.id, is_verified=False).update(
+            is_verified=True
+        )
+        if verified:
+            schedule_credential_issuance(voter.election_id)
+        data = envelope(
+            None,
+            f"voter verified, your credentials will be sent to your email shortly",
         )
-        data = {
-            "status": "success",
-            "message": f"voter verified and credentials has been sent to your email successfully",
-            "data": None,
-        }
         return Response(data, status=status.HTTP_200_OK)
 
 
@@ -199,11 +211,7 @@ class VoterLoginView(generics.GenericAPIView):
         )
         serializer.is_valid(raise_exception=True)
         data = serializer.save()
-        data = {
-            "status": "success",
-            "message": f"Voter's credentials are valid",
-            "data": data,
-        }
+        data = envelope(data, f"Voter's credentials are valid")
         return Response(data, status=status.HTTP_200_OK)
 
 
@@ -220,17 +228,15 @@ class VotingView(generics.GenericAPIView):
         )
         serializer.is_valid(raise_exception=True)
         data = serializer.save(voter=request.user)
-        data = {
-            "status": "success",
-            "message": f"Voting process completed successfully",
-            "data": data,
-        }
+        data = envelope(data, f"Voting process completed successfully")
         return Response(data, status=status.HTTP_200_OK)
 
 
 VoterListCreateView = VoterListCreateView.as_view()
 VoterRetrieveUpdateDeleteView = VoterRetrieveUpdateDeleteView.as_view()
 VoterBatchCreateView = VoterBatchCreateView.as_view()
+VoterImportView = VoterImportView.as_view()
+VoterImportJobView = VoterImportJobView.as_view()
 VoterVerificationView = VoterVerificationView.as_view()
 VoterLoginView = VoterLoginView.as_view()
 VotingView = VotingView.as_view()
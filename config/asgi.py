@@ -2,6 +2,8 @@
 ASGI config for config project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Live results streams (/elections/<id>/results/stream) are served directly
+from here, every other request goes to Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
@@ -10,7 +12,20 @@ https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
 import os
 
 from django.core.asgi import get_asgi_application
+from dotenv import load_dotenv
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+load_dotenv()  # take environment variables from .env.
 
-application = get_asgi_application()
+ENVIRONMENT = os.getenv("ENV")
+os.environ.setdefault(
+    "DJANGO_SETTINGS_MODULE", "config.settings.dev"
+) if ENVIRONMENT == "DEVELOPMENT" else os.environ.setdefault(
+    "DJANGO_SETTINGS_MODULE", "config.settings.prod"
+)
+
+django_application = get_asgi_application()
+
+# imported once django is set up
+from apps.election.streams import results_stream_application  # noqa: E402
+
+application = results_stream_application(django_application)
@@ -16,6 +16,20 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
 app = Celery("config")
 app.config_from_object("django.conf:settings", namespace="CELERY")
 app.autodiscover_tasks()
+app.conf.beat_schedule = {
+    "freeze-ended-elections": {
+        "task": "apps.election.tasks.freeze_ended_elections_task",
+        "schedule": 5 * 60,
+    },
+    "issue-pending-credentials": {
+        "task": "apps.voting.tasks.issue_pending_credentials_task",
+        "schedule": 10 * 60,
+    },
+    "drain-email-outbox": {
+        "task": "apps.voting.tasks.drain_outbox_task",
+        "schedule": 60,
+    },
+}
 
 
 @app.task(bind=True)
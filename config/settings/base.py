@@ -126,6 +126,10 @@ STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 # FILE UPLOAD
 MEDIA_URL = "media/"
 MEDIA_ROOT = BASE_DIR / "media"
+
+# widths of the resized variants generated for ballot question and option images
+IMAGE_VARIANT_WIDTHS = [160, 320, 640, 1280]
+IMAGE_VARIANT_QUALITY = 80
 FILE_UPLOAD_PERMISSION = 0o64
 
 # Default primary key field type
@@ -153,11 +157,15 @@ LOGGING = {
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication"
+        "apps.accounts.authentication.CachedJWTAuthentication"
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "apps.common.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
     "EXCEPTION_HANDLER": "apps.common.exceptions.custom_exception_handler",
 }
 
@@ -165,6 +173,76 @@ REST_FRAMEWORK = {
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
 
 
+# VOTES
+# number of counter rows each option's tally is split across
+OPTION_TALLY_SLOTS = 8
+
+# VOTER IMPORTS
+# rows of an uploaded voter roll normalized and upserted together
+VOTER_IMPORT_CHUNK_SIZE = 5000
+VOTER_IMPORT_MAX_REPORTED_REJECTIONS = 100
+
+# ORGANIZERS
+# organizers each process keeps to authenticate access tokens without a
+# query, and for how long a change made in another process may go unnoticed
+ORGANIZER_AUTH_CACHE_SIZE = 1000
+ORGANIZER_AUTH_CACHE_TIMEOUT_IN_SECS = 30
+
+# VOTER CREDENTIALS
+# credentials of voters verifying within this window are issued by one job
+CREDENTIAL_ISSUANCE_DELAY_IN_SECS = 10
+# voters whose pass keys are hashed, saved and mailed together
+CREDENTIAL_ISSUANCE_CHUNK_SIZE = 500
+# threads hashing pass keys, PBKDF2 releases the GIL so one per core
+CREDENTIAL_HASHING_WORKERS = os.cpu_count() or 1
+# web server processes on the machine, gunicorn reads the same variable
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+# threads of every process verifying pass keys at login, the processes
+# sharing the cores, and how many logins may wait for one before the rest
+# are asked to retry (429)
+LOGIN_VERIFICATION_WORKERS = max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY)
+LOGIN_VERIFICATION_MAX_QUEUE = 256
+# voters each process keeps to authenticate voter tokens without a query,
+# and for how long a change made in another process may go unnoticed
+VOTER_AUTH_CACHE_SIZE = 10000
+VOTER_AUTH_CACHE_TIMEOUT_IN_SECS = 60
+
+# EMAILS
+# voters whose verification mails are queued in the outbox together
+VERIFICATION_EMAIL_CHUNK_SIZE = 200
+# token bucket of every provider voter mails go out through: "rate" mails
+# per second up to bursts of "burst" mails, "connection" is passed to
+# django.core.mail.get_connection
+EMAIL_OUTBOX_PROVIDERS = {
+    "default": {"rate": 5, "burst": 20, "connection": {}},
+}
+# how long one sender task keeps sending before it hands over to the next
+EMAIL_OUTBOX_RUN_IN_SECS = 50
+# how long claimed mails stay with a sender that may have died
+EMAIL_OUTBOX_LEASE_IN_SECS = 5 * 60
+# retries back off exponentially from the first delay up to the maximum
+EMAIL_OUTBOX_RETRY_DELAY_IN_SECS = 30
+EMAIL_OUTBOX_MAX_RETRY_DELAY_IN_SECS = 60 * 60
+EMAIL_OUTBOX_MAX_ATTEMPTS = 8
+# how long a provider that failed (refused, throttled) is left alone
+EMAIL_OUTBOX_PROVIDER_PAUSE_IN_SECS = 30
+
+# RESULTS
+# how long a results snapshot may be served after votes changed it
+ELECTION_RESULTS_MAX_STALENESS_IN_SECS = 1
+# lifetime of a snapshot while the election is running
+ELECTION_RESULTS_CACHE_TIMEOUT_IN_SECS = 5 * 60
+ELECTION_RESULTS_LOCK_TIMEOUT_IN_SECS = 30
+# how long clients may reuse frozen results before revalidating their ETag,
+# results are frozen again when the end_date moves
+ELECTION_FROZEN_RESULTS_MAX_AGE_IN_SECS = 60
+# how long a code keeps pointing at a cached ballot before it is checked
+# against Election.last_updated again (changes also expire it right away)
+ELECTION_BALLOT_CACHE_TIMEOUT_IN_SECS = 60
+# redis used to fan live results out to every ASGI process,
+# falls back to an in-process fan-out when not set
+RESULTS_PUBSUB_URL = os.getenv("RESULTS_PUBSUB_URL")
+
 DEFAULT_FROM_EMAIL = os.getenv("DEFAULT_FROM_EMAIL")
 VOTER_JWT_SECRET_KEY = os.getenv("VOTER_JWT_SECRET_KEY")
 ADMIN_URL_PATH = os.getenv("ADMIN_URL_PATH")
\ No newline at end of file
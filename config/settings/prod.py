@@ -21,6 +21,14 @@ DATABASES = {
         "PORT": os.getenv("DB_PORT"),
     }
 }
+# CACHE
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("CACHE_URL"),
+    }
+}
+
 # CORS
 CORS_ALLOWED_ORIGINS = ["http://localhost:3000", "http://127.0.0.1:5000",]
 